@@ -1,25 +1,320 @@
+import atexit
+import fnmatch
+import itertools
 import json
+import os
+import queue
 import subprocess
-from typing import List
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Mapping, Optional
 
 from core.artifacts import store_issues
+from core.config import RUFF_CACHE_DIR
+from core.json_utils import loads
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: project excludes cannot be read, so the server is not used
+    tomllib = None
 
 
 def run_ruff_on_path(path: str) -> List[dict]:
-    # Example: ruff in JSON mode
+    # ruff exits non-zero whenever it reports issues, so parse stdout regardless
     try:
         result = subprocess.run(
-            ["ruff", "check", path, "--format", "json"],
+            ["ruff", "check", path, "--output-format=json", "--no-fix", "--force-exclude",
+             "--cache-dir", RUFF_CACHE_DIR],
             capture_output=True,
-            text=True,
-            check=True,
+            check=False,
         )
-        issues = json.loads(result.stdout or "[]")
+        return loads(result.stdout or b"[]")
+    except (OSError, ValueError):
+        return []
+
+
+# Seconds to wait for any single reply from `ruff server` before giving up on it
+RUFF_SERVER_TIMEOUT = 30.0
+# Servers kept warm at once, one per repo root; the least recently used is shut down
+RUFF_SERVER_MAX = 4
+
+
+class _RuffServer:
+    """Minimal LSP client for a long-lived `ruff server` process.
+
+    Keeps ruff warm between single-file checks so repeated re-lints (e.g. in
+    `compute_confidence`) skip process startup. The server is opened on `root` as its
+    workspace so it resolves the same ruff.toml/pyproject.toml as `ruff check` does.
+    Diagnostics are pulled with `textDocument/diagnostic` and converted to ruff's JSON
+    issue shape.
+    """
+
+    def __init__(self, root: str):
+        self.proc = subprocess.Popen(
+            ["ruff", "server"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        # Held for a whole request/response exchange; the protocol is not multiplexed here
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Messages are read on a daemon thread so a wedged server can be timed out
+        self._inbox: "queue.Queue[Optional[dict]]" = queue.Queue()
+        threading.Thread(target=self._pump, name="ruff-server-reader", daemon=True).start()
+        root_uri = Path(os.path.abspath(root)).as_uri()
+        self._request("initialize", {
+            "processId": os.getpid(),
+            "rootUri": root_uri,
+            "workspaceFolders": [{"uri": root_uri, "name": os.path.basename(root.rstrip(os.sep)) or root}],
+            "capabilities": {},
+        })
+        self._notify("initialized", {})
+
+    def _send(self, message: dict) -> None:
+        body = json.dumps(message).encode("utf-8")
+        self.proc.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self.proc.stdin.flush()
+
+    def _read_message(self) -> Optional[dict]:
+        length = None
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        return loads(self.proc.stdout.read(length))
+
+    def _pump(self) -> None:
+        try:
+            while True:
+                msg = self._read_message()
+                if msg is None:
+                    break
+                self._inbox.put(msg)
+        except Exception:
+            pass
+        self._inbox.put(None)
+
+    def _read(self) -> dict:
+        try:
+            msg = self._inbox.get(timeout=RUFF_SERVER_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError("ruff server did not respond") from None
+        if msg is None:
+            self._inbox.put(None)
+            raise EOFError("ruff server exited")
+        return msg
+
+    def _notify(self, method: str, params: dict) -> None:
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _request(self, method: str, params: dict):
+        req_id = next(self._ids)
+        self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+        while True:
+            msg = self._read()
+            if "method" in msg:
+                # Server-initiated request (e.g. registerCapability): acknowledge and keep waiting
+                if "id" in msg:
+                    self._send({"jsonrpc": "2.0", "id": msg["id"], "result": None})
+                continue
+            if msg.get("id") == req_id:
+                if "error" in msg:
+                    raise RuntimeError(msg["error"].get("message", "ruff server error"))
+                return msg.get("result")
+
+    def check(self, content: str, filename: str) -> List[dict]:
+        path = os.path.abspath(filename)
+        uri = Path(path).as_uri()
+        self._notify("textDocument/didOpen", {
+            "textDocument": {"uri": uri, "languageId": "python", "version": 1, "text": content},
+        })
+        try:
+            result = self._request("textDocument/diagnostic", {"textDocument": {"uri": uri}}) or {}
+        finally:
+            self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+        issues = []
+        for diag in result.get("items", []):
+            start = diag["range"]["start"]
+            end = diag["range"]["end"]
+            issues.append({
+                "code": diag.get("code"),
+                "message": diag.get("message", "").split("\n", 1)[0],
+                "filename": path,
+                "location": {"row": start["line"] + 1, "column": start["character"] + 1},
+                "end_location": {"row": end["line"] + 1, "column": end["character"] + 1},
+            })
         return issues
+
+    def close(self) -> None:
+        try:
+            self.proc.terminate()
+        except Exception:
+            pass
+
+
+# ruff's built-in `exclude`, replaced (not extended) when a project sets its own
+_RUFF_DEFAULT_EXCLUDE = (
+    ".bzr", ".direnv", ".eggs", ".git", ".git-rewrite", ".hg", ".ipynb_checkpoints", ".mypy_cache",
+    ".nox", ".pants.d", ".pyenv", ".pytest_cache", ".pytype", ".ruff_cache", ".svn", ".tox", ".venv",
+    ".vscode", "__pypackages__", "_build", "buck-out", "dist", "node_modules", "site-packages", "venv",
+)
+# Config files in the order ruff prefers them within one directory
+_RUFF_CONFIG_FILES = (".ruff.toml", "ruff.toml", "pyproject.toml")
+
+
+def _ruff_settings(directory: str) -> Optional[dict]:
+    """Return the ruff settings defined in directory, or None if it has no ruff config."""
+    for name in _RUFF_CONFIG_FILES:
+        config = os.path.join(directory, name)
+        if not os.path.isfile(config):
+            continue
+        with open(config, "rb") as fh:
+            data = tomllib.load(fh)
+        if name != "pyproject.toml":
+            return data
+        if "ruff" in data.get("tool", {}):
+            return data["tool"]["ruff"]
+    return None
+
+
+def _ruff_excluded(filename: str, root: str) -> bool:
+    """Whether `ruff check --force-exclude` would skip filename under root's configuration.
+
+    Mirrors ruff's file resolver: the nearest config between the file and root supplies
+    `exclude` (or the defaults) plus `extend-exclude`, and a pattern matches if it
+    matches the file or one of its parent directories, either by name or as a path
+    relative to that config. Files that cannot be resolved count as excluded, so the
+    caller falls back to `ruff check` itself.
+    """
+    if tomllib is None:
+        return True
+    root = os.path.abspath(root)
+    path = os.path.abspath(filename)
+    if path == root or os.path.commonpath([root, path]) != root:
+        return False
+    # Directories from the file's own up to root, nearest first
+    parents = []
+    directory = os.path.dirname(path)
+    while directory != root:
+        parents.append(directory)
+        directory = os.path.dirname(directory)
+    parents.append(root)
+    settings, config_dir = {}, root
+    try:
+        for directory in parents:
+            found = _ruff_settings(directory)
+            if found is not None:
+                settings, config_dir = found, directory
+                break
+    except (OSError, ValueError):
+        return True
+    patterns = list(settings.get("exclude", _RUFF_DEFAULT_EXCLUDE)) + list(settings.get("extend-exclude", []))
+    for candidate in [path] + parents[:-1]:
+        name = os.path.basename(candidate)
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(
+                candidate, os.path.normpath(os.path.join(config_dir, pattern))
+            ):
+                return True
+    return False
+
+
+# Warm servers by absolute repo root, most recently used last
+_RUFF_SERVERS: "OrderedDict[str, _RuffServer]" = OrderedDict()
+_RUFF_SERVER_LOCK = threading.Lock()
+
+
+def _close_ruff_servers() -> None:
+    with _RUFF_SERVER_LOCK:
+        while _RUFF_SERVERS:
+            _RUFF_SERVERS.popitem()[1].close()
+
+
+atexit.register(_close_ruff_servers)
+
+
+def _ruff_server_check(content: str, filename: str, root: str) -> Optional[List[dict]]:
+    """Check content on the ruff server for root, starting it lazily. Returns None if unavailable."""
+    key = os.path.abspath(root)
+    server = None
+    try:
+        with _RUFF_SERVER_LOCK:
+            server = _RUFF_SERVERS.pop(key, None)
+            if server is None or server.proc.poll() is not None:
+                server = _RuffServer(key)
+            _RUFF_SERVERS[key] = server
+            while len(_RUFF_SERVERS) > RUFF_SERVER_MAX:
+                _RUFF_SERVERS.popitem(last=False)[1].close()
+        with server.lock:
+            return server.check(content, filename)
+    except Exception:
+        if server is not None:
+            server.close()
+            with _RUFF_SERVER_LOCK:
+                if _RUFF_SERVERS.get(key) is server:
+                    del _RUFF_SERVERS[key]
+        return None
+
+
+def run_ruff_on_content(content: str, filename: str, root: Optional[str] = None) -> List[dict]:
+    """Lint a single file's contents without walking the tree.
+
+    With `root` (the repository the file belongs to) this uses a warm `ruff server`
+    opened on that root when possible; otherwise, or if the server fails, it pipes the
+    contents to `ruff check -` on stdin. Both resolve the repo's ruff configuration.
+    Files the project excludes always take the stdin path, whose `--force-exclude`
+    skips them, since the server is not relied on to apply `exclude`.
+    """
+    if root is not None and not _ruff_excluded(filename, root):
+        issues = _ruff_server_check(content, filename, root)
+        if issues is not None:
+            return issues
+    try:
+        result = subprocess.run(
+            [
+                "ruff", "check", "-",
+                "--stdin-filename", filename,
+                "--output-format=json",
+                "--no-fix",
+                "--force-exclude",
+            ],
+            input=content.encode("utf-8"),
+            capture_output=True,
+            check=False,
+        )
+        return loads(result.stdout or b"[]")
     except Exception:
         return []
 
 
+def _changed_files(repo_path: str) -> Optional[List[str]]:
+    """Return repo-relative paths modified or added in the working tree, or None if git is unavailable."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_path, "status", "--porcelain", "--untracked-files=all"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except Exception:
+        return None
+    changed = []
+    for line in result.stdout.splitlines():
+        path = line[3:]
+        if " -> " in path:
+            path = path.split(" -> ", 1)[1]
+        changed.append(path.strip('"'))
+    return changed
+
+
 def analyze_repo_for_issues(local_path: str) -> str:
     issues = run_ruff_on_path(local_path)
     # Always store (even if empty) so pipeline continues with a valid report ID
@@ -37,10 +332,9 @@ def run_bandit_on_path(path: str) -> str:
         result = subprocess.run(
             ["bandit", "-r", path, "-f", "json"],
             capture_output=True,
-            text=True,
             check=True,
         )
-        data = json.loads(result.stdout or "{}")
+        data = loads(result.stdout or b"{}")
         issues = data.get("results", [])
         if issues:
             report_id = store_issues(issues, path)
@@ -52,7 +346,7 @@ def run_bandit_on_path(path: str) -> str:
     except subprocess.CalledProcessError as e:
         # Bandit may return non-zero on findings; still try to parse stdout
         try:
-            data = json.loads(e.stdout or "{}")
+            data = loads(e.stdout or b"{}")
             issues = data.get("results", [])
             if issues:
                 report_id = store_issues(issues, path)
@@ -62,20 +356,48 @@ def run_bandit_on_path(path: str) -> str:
         return f"Bandit run failed: {e}"
 
 
-def compute_confidence(report_id: str, repo_path: str) -> dict:
+def compute_confidence(
+    report_id: str, repo_path: str, changed_files: Optional[Iterable[str] | Mapping[str, str]] = None
+) -> dict:
     """Compute a simple confidence score by re-running ruff and comparing issue counts.
 
+    Only files in `changed_files` (or, if not given, those git reports as modified) are
+    re-linted via stdin; issues stored for untouched files are carried over as-is.
+    `changed_files` may also map paths to their new content, as returned by
+    `fix_issues_with_llm`, which skips reading them back from disk.
+    Falls back to a full re-scan when the changed set cannot be determined.
+
     Returns a dict with `score` (0-1) and textual `summary`.
     """
     try:
-        before_data = None
         from core.artifacts import get_artifact
 
         before = get_artifact(report_id)
         before_count = before.get("count", 0) if before else 0
-        # Re-run ruff to get post-fix issues
-        new_issues = run_ruff_on_path(repo_path)
-        after_count = len(new_issues) if new_issues else 0
+        if changed_files is None:
+            changed_files = _changed_files(repo_path)
+        if changed_files is None:
+            # Re-run ruff to get post-fix issues
+            new_issues = run_ruff_on_path(repo_path)
+            after_count = len(new_issues) if new_issues else 0
+        else:
+            contents = changed_files if isinstance(changed_files, Mapping) else {}
+            touched = {os.path.abspath(os.path.join(repo_path, f)): f for f in changed_files}
+            before_issues = before.get("issues", []) if before else []
+            before_files = (before.get("files") if before else None) or [
+                issue.get("filename") for issue in before_issues
+            ]
+            after_count = sum(1 for f in before_files if os.path.abspath(f or "") not in touched)
+            for path, key in touched.items():
+                if not path.endswith((".py", ".pyi")):
+                    continue
+                content = contents.get(key)
+                if content is None:
+                    if not os.path.isfile(path):
+                        continue
+                    with open(path, "r", encoding="utf-8") as fh:
+                        content = fh.read()
+                after_count += len(run_ruff_on_content(content, path, repo_path))
         if before_count == 0:
             score = 1.0 if after_count == 0 else 0.5
         else:
@@ -1,111 +1,120 @@
 import asyncio
+import functools
 import json
 import os
 
 try:
     from google.genai.agents import Runner
 except Exception:
-    import importlib.util
-    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    agents_path = os.path.join(base, "google", "genai", "agents.py")
-    spec = importlib.util.spec_from_file_location("google.genai.agents", agents_path)
-    agents_mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(agents_mod)
-    Runner = agents_mod.Runner
+    # core.agent_runtime loads the bundled stub once and registers it in sys.modules
+    from core.agent_runtime import Runner
 
 from core.agent_runtime import run_agent
 from core.artifacts import get_artifact
 from core.git_utils import write_file
+from core.logging_utils import get_logger
 
-async def fix_issues_with_llm(runner_fix: Runner, session_id: str, report_id: str):
-    """Fix issues found by linting. Handles gracefully even with 0 issues or LLM timeouts."""
+log = get_logger("fix")
+
+# Max number of files being fixed by the LLM at the same time
+FIX_CONCURRENCY = 8
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as fh:
+        return fh.read()
+
+
+async def fix_issues_with_llm(runner_fix: Runner, session_id: str, report_id: str, max_concurrency: int = FIX_CONCURRENCY):
+    """Fix issues found by linting. Handles gracefully even with 0 issues or LLM timeouts.
+
+    Issues are grouped by file and each file gets a single LLM call carrying all of its
+    issues. Different files are fixed concurrently, bounded by `max_concurrency`.
+
+    Returns a dict mapping each rewritten file to its new content, so later stages
+    can use it without reading the file again.
+    """
+    file_cache = {}
     artifact = get_artifact(report_id)
     if not artifact:
-        print(f"Report id {report_id} not found.")
-        return
+        log.warning("Report id %s not found.", report_id)
+        return file_cache
 
     issues = artifact.get("issues", [])
+    serialized = artifact.get("serialized") or [json.dumps(issue, default=str) for issue in issues]
+    files = artifact.get("files") or [issue.get("filename") or issue.get("file") for issue in issues]
     issue_count = len(issues)
-    print(f"[Fix Agent] Found {issue_count} issues to fix")
+    log.info("[Fix Agent] Found %d issues to fix", issue_count)
 
     if issue_count == 0:
-        print("[Fix Agent] No issues to fix, skipping LLM calls")
-        return
+        log.info("[Fix Agent] No issues to fix, skipping LLM calls")
+        return file_cache
 
-    fixed_count = 0
-    for idx, issue in enumerate(issues, 1):
-        filename = issue.get("filename") or issue.get("file")
+    by_file = {}
+    for idx, (issue, filename) in enumerate(zip(issues, files), 1):
         if not filename:
-            print(f"[Fix Agent] Issue {idx}/{issue_count}: No filename, skipping")
+            log.info("[Fix Agent] Issue %d/%d: No filename, skipping", idx, issue_count)
             continue
 
         if not os.path.exists(filename):
-            print(f"[Fix Agent] Issue {idx}/{issue_count}: File not found {filename}, skipping")
+            log.info("[Fix Agent] Issue %d/%d: File not found %s, skipping", idx, issue_count, filename)
             continue
 
-        try:
-            with open(filename, "r", encoding="utf-8") as fh:
-                current_content = fh.read()
+        # Normalise so relative and absolute spellings of one file share a single read
+        by_file.setdefault(os.path.abspath(filename), []).append((idx, issue))
+
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def _fix_file(filename, file_issues):
+        async with sem:
+            current_content = file_cache.get(filename)
+            if current_content is None:
+                # File I/O runs off the event loop so other files' LLM calls keep going
+                current_content = await asyncio.to_thread(_read_text, filename)
 
             prompt = (
-                "Here is the current file content and suggestion by ruff. "
-                "Fix the code according to suggestions.\n\n"
+                "Here is the current file content and suggestions by ruff. "
+                "Fix the code according to all of the suggestions.\n\n"
                 f"File Content:\n{current_content}\n\n"
-                f"suggestion:\n{json.dumps(issue, default=str)}"
+                f"suggestions:\n[{','.join(serialized[idx - 1] for idx, _ in file_issues)}]"
             )
-            
-            print(f"[Fix Agent] Issue {idx}/{issue_count}: Calling LLM for {filename}...")
+
+            log.info("[Fix Agent] Calling LLM for %s (%d issues)...", filename, len(file_issues))
             try:
                 # Add timeout to LLM call (30 seconds)
                 fix_resp = await asyncio.wait_for(run_agent(runner_fix, session_id, prompt), timeout=30.0)
-                if fix_resp and fix_resp.strip():
-                    write_file(filename, fix_resp)
-                    print(f"[Fix Agent] ✅ Updated {filename}")
-                    fixed_count += 1
-                else:
-                    print(f"[Fix Agent] LLM returned empty response for {filename}")
             except asyncio.TimeoutError:
-                print(f"[Fix Agent] ⏱️ LLM timeout for {filename}, skipping")
-                # Continue with next issue instead of stopping
-            except Exception as e:
-                print(f"[Fix Agent] ❌ LLM error for {filename}: {e}")
-                # Continue with next issue instead of stopping
-        except Exception as e:
-            print(f"[Fix Agent] Error processing issue {idx}: {e}")
-            continue
+                log.warning("[Fix Agent] ⏱️ LLM timeout for %s, skipping", filename)
+                return 0
+            if not (fix_resp and fix_resp.strip()):
+                log.warning("[Fix Agent] LLM returned empty response for %s", filename)
+                return 0
+            await asyncio.to_thread(write_file, filename, fix_resp)
+            file_cache[filename] = fix_resp
+            log.info("[Fix Agent] ✅ Updated %s", filename)
+            return len(file_issues)
 
-    print(f"[Fix Agent] Completed: Fixed {fixed_count}/{issue_count} issues")
+    results = await asyncio.gather(
+        *(_fix_file(filename, file_issues) for filename, file_issues in by_file.items()),
+        return_exceptions=True,
+    )
+    # Anything other than a timeout is reported per file with its type, so real bugs stay visible
+    fixed_count = 0
+    for (filename, _), res in zip(by_file.items(), results):
+        if isinstance(res, Exception):
+            log.error("[Fix Agent] ❌ Error processing %s: %s: %s", filename, type(res).__name__, res)
+        else:
+            fixed_count += res
 
+    log.info("[Fix Agent] Completed: Fixed %d/%d issues", fixed_count, issue_count)
+    return file_cache
 
-def detect_repo_language(repo_path: str) -> str:
-    """Detect repo language by checking for package.json, requirements.txt, etc."""
-    if os.path.exists(os.path.join(repo_path, "package.json")):
-        return "javascript"  # React/Vue/Node
-    elif os.path.exists(os.path.join(repo_path, "requirements.txt")) or os.path.exists(os.path.join(repo_path, "setup.py")):
-        return "python"
-    elif os.path.exists(os.path.join(repo_path, "go.mod")):
-        return "go"
-    elif os.path.exists(os.path.join(repo_path, "Cargo.toml")):
-        return "rust"
-    else:
-        # Default to javascript if mixed indicators
-        return "javascript" if os.path.exists(os.path.join(repo_path, "src")) else "python"
 
+# Templates used by generate_code_from_requirement. The *_TPL ones are filled in
+# with str.format_map, so literal braces in them are doubled.
+_THEME_KEYWORDS = ("dark", "light", "mode", "theme")
 
-async def generate_code_from_requirement(runner_fix: Runner, session_id: str, repo_path: str, requirement: str):
-    """Generate real implementation code based on user requirement."""
-    print(f"\n[Requirement Agent] Processing requirement: {requirement}")
-    try:
-        created_files = []
-        lang = detect_repo_language(repo_path)
-        req_low = requirement.lower()
-
-        if lang == "javascript":
-            if "dark" in req_low or "light" in req_low or "mode" in req_low or "theme" in req_low:
-                # Theme toggle component
-                component_dir = os.path.join(repo_path, "src", "components")
-                component_path = os.path.join(component_dir, "ThemeToggle.jsx")
-                component_code = '''import React, { useState } from 'react';
+_JS_THEME_TOGGLE = '''import React, { useState } from 'react';
 
 export default function ThemeToggle() {
   const [isDark, setIsDark] = useState(false);
@@ -123,14 +132,8 @@ export default function ThemeToggle() {
   );
 }
 '''
-                write_file(component_path, component_code)
-                created_files.append(os.path.relpath(component_path, repo_path).replace('\\', '/'))
-            else:
-                # Generic feature component
-                safe_name = requirement.title().replace(' ', '').replace('-', '')
-                component_dir = os.path.join(repo_path, "src", "components")
-                component_path = os.path.join(component_dir, f"{safe_name}Feature.jsx")
-                component_code = f'''import React, {{ useState }} from 'react';
+
+_JS_FEATURE_TPL = '''import React, {{ useState }} from 'react';
 
 export default function {safe_name}Feature() {{
   const [data, setData] = useState([]);
@@ -143,14 +146,8 @@ export default function {safe_name}Feature() {{
   );
 }}
 '''
-                write_file(component_path, component_code)
-                created_files.append(os.path.relpath(component_path, repo_path).replace('\\', '/'))
 
-        elif lang == "python":
-            if "dark" in req_low or "light" in req_low or "mode" in req_low or "theme" in req_low:
-                # Theme manager module
-                module_path = os.path.join(repo_path, "theme_manager.py")
-                module_code = '''"""Theme management for the application."""
+_PY_THEME_MANAGER = '''"""Theme management for the application."""
 
 class ThemeManager:
     """Manages application theme (dark/light mode)."""
@@ -171,16 +168,10 @@ class ThemeManager:
         """Get current theme config."""
         return self.themes.get(self.current_theme, {})
 '''
-                write_file(module_path, module_code)
-                created_files.append(os.path.relpath(module_path, repo_path).replace('\\', '/'))
-            else:
-                # Generic feature module
-                module_name = requirement.lower().replace(' ', '_').replace('-', '_')
-                module_path = os.path.join(repo_path, f"{module_name}.py")
-                safe_class = requirement.title().replace(' ', '').replace('-', '')
-                module_code = f'''"""Implementation for: {requirement}"""
 
-class {safe_class}:
+_PY_FEATURE_TPL = '''"""Implementation for: {requirement}"""
+
+class {safe_name}:
     """Implementation of {requirement} feature."""
     
     def __init__(self):
@@ -190,8 +181,77 @@ class {safe_class}:
         print(f"Executing: {requirement}")
         return True
 '''
-                write_file(module_path, module_code)
-                created_files.append(os.path.relpath(module_path, repo_path).replace('\\', '/'))
+
+
+def detect_repo_language(repo_path: str) -> str:
+    """Detect repo language by checking for package.json, requirements.txt, etc."""
+    # Keyed on the directory mtime, so adding/removing top-level files invalidates the entry
+    try:
+        mtime_ns = os.stat(repo_path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return _detect_repo_language(repo_path, mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _detect_repo_language(repo_path: str, mtime_ns) -> str:
+    try:
+        with os.scandir(repo_path) as entries:
+            names = {entry.name for entry in entries}
+    except OSError:
+        names = set()
+
+    if "package.json" in names:
+        return "javascript"  # React/Vue/Node
+    elif "requirements.txt" in names or "setup.py" in names:
+        return "python"
+    elif "go.mod" in names:
+        return "go"
+    elif "Cargo.toml" in names:
+        return "rust"
+    else:
+        # Default to javascript if mixed indicators
+        return "javascript" if "src" in names else "python"
+
+
+async def generate_code_from_requirement(runner_fix: Runner, session_id: str, repo_path: str, requirement: str):
+    """Generate real implementation code based on user requirement."""
+    log.info("\n[Requirement Agent] Processing requirement: %s", requirement)
+    try:
+        created_files = []
+        lang = detect_repo_language(repo_path)
+        req_low = requirement.lower()
+        is_theme = any(k in req_low for k in _THEME_KEYWORDS)
+        fields = {
+            "requirement": requirement,
+            "safe_name": requirement.title().replace(' ', '').replace('-', ''),
+        }
+
+        if lang == "javascript":
+            component_dir = os.path.join(repo_path, "src", "components")
+            if is_theme:
+                # Theme toggle component
+                component_path = os.path.join(component_dir, "ThemeToggle.jsx")
+                component_code = _JS_THEME_TOGGLE
+            else:
+                # Generic feature component
+                component_path = os.path.join(component_dir, f"{fields['safe_name']}Feature.jsx")
+                component_code = _JS_FEATURE_TPL.format_map(fields)
+            write_file(component_path, component_code)
+            created_files.append(os.path.relpath(component_path, repo_path).replace('\\', '/'))
+
+        elif lang == "python":
+            if is_theme:
+                # Theme manager module
+                module_path = os.path.join(repo_path, "theme_manager.py")
+                module_code = _PY_THEME_MANAGER
+            else:
+                # Generic feature module
+                module_name = req_low.replace(' ', '_').replace('-', '_')
+                module_path = os.path.join(repo_path, f"{module_name}.py")
+                module_code = _PY_FEATURE_TPL.format_map(fields)
+            write_file(module_path, module_code)
+            created_files.append(os.path.relpath(module_path, repo_path).replace('\\', '/'))
 
         # Create implementation documentation
         doc_path = os.path.join(repo_path, "IMPLEMENTATION.md")
@@ -203,9 +263,9 @@ class {safe_class}:
         write_file(doc_path, '\n'.join(doc_lines))
         created_files.append(os.path.relpath(doc_path, repo_path).replace('\\', '/'))
 
-        print(f"[Requirement Agent] ✅ Generated files: {created_files}")
+        log.info("[Requirement Agent] ✅ Generated files: %s", created_files)
         return created_files
     except Exception as e:
-        print(f"[Requirement Agent] ❌ Error generating code: {e}")
+        log.error("[Requirement Agent] ❌ Error generating code: %s", e)
         raise
 
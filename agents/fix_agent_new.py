@@ -5,13 +5,8 @@ import os
 try:
     from google.genai.agents import Runner
 except Exception:
-    import importlib.util
-    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    agents_path = os.path.join(base, "google", "genai", "agents.py")
-    spec = importlib.util.spec_from_file_location("google.genai.agents", agents_path)
-    agents_mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(agents_mod)
-    Runner = agents_mod.Runner
+    # core.agent_runtime loads the bundled stub once and registers it in sys.modules
+    from core.agent_runtime import Runner
 
 from core.agent_runtime import run_agent
 from core.artifacts import get_artifact
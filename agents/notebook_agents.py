@@ -13,25 +13,41 @@ import os
 import json
 import shutil
 import asyncio
+import functools
+import hashlib
 import git
 import uuid
 import subprocess
 import re
 import logging
-from typing import List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Tuple
 from urllib.parse import quote, urlparse, urlunparse
 from datetime import datetime
 from pydantic import BaseModel, Field
-import requests
+
+from core.artifact_store import ARTIFACT_STORE, MEMORY_BANK
+from core.config import RUFF_CACHE_DIR
+from core.git_utils import forget_repo
+from core.http_client import GITHUB_SESSION
+from core.json_utils import dumpb, dumps, loads
 
 # Constants
 MODEL_NAME = "gemini-2.0-flash"
 APP_NAME = "auto-patch-pr-agent"
 TEMP_REPOS_DIR = "./temp_repos"
 
-# Global stores
-ARTIFACT_STORE = {}  # In-memory artifact store for issues
-MEMORY_BANK = {}  # Long-term memory bank for adaptive learning
+# Directories skipped by both ruff and the Python-side file scan
+IGNORE_DIRS = ('.git', '.venv', '__pycache__', 'node_modules')
+# Files ruff lints by default, and the config files that change what it reports on them
+LINT_SUFFIXES = ('.py', '.pyi', '.ipynb')
+_RUFF_CONFIG_NAMES = frozenset({'pyproject.toml', 'ruff.toml', '.ruff.toml'})
+
+_GH_RE = re.compile(r"github\.com[:/](?P<owner>[^/]+)/(?P<repo>[^/]+?)(?:\.git)?(?:/|$)")
+_BRANCH_SAFE_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+# Shared GitHub API session (the same pool the pipeline's publish agent uses)
+_GH = GITHUB_SESSION
 
 
 class FilFixingStatus(BaseModel):
@@ -63,16 +79,22 @@ def clone_repository(repo_url: str, github_token: str = "", branch: str = "") ->
     repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
     local_path = os.path.abspath(os.path.join(TEMP_REPOS_DIR, repo_name))
     
+    clone_url = repo_url.replace("https://", f"https://{github_token}@") if github_token else repo_url
+    if os.path.isdir(os.path.join(local_path, ".git")) and _refresh_clone(local_path, clone_url, branch):
+        return local_path
+
     if os.path.exists(local_path):
+        # Other tools may hold a cached Repo for this path; it must not outlive the old clone
+        forget_repo(local_path)
         shutil.rmtree(local_path)
     ensure_dir(os.path.dirname(local_path))
 
+    # Only the current tree is inspected, so skip history and fetch blobs lazily
+    clone_opts = ["--depth=1", "--single-branch", "--filter=blob:none"]
+    if branch:
+        clone_opts += ["--branch", branch]
     try:
-        if github_token:
-            auth_url = repo_url.replace("https://", f"https://{github_token}@")
-            git.Repo.clone_from(auth_url, local_path)
-        else:
-            git.Repo.clone_from(repo_url, local_path)
+        git.Repo.clone_from(clone_url, local_path, multi_options=clone_opts)
     except Exception as e:
         return f"Error cloning repo: {e}"
 
@@ -111,19 +133,80 @@ def clone_repository(repo_url: str, github_token: str = "", branch: str = "") ->
     return local_path
 
 
+def _refresh_clone(local_path: str, clone_url: str, branch: str = "") -> bool:
+    """Reset an existing clone of clone_url to the tip of its remote branch.
+
+    Returns False when the checkout belongs to another remote or cannot be
+    updated, in which case the caller re-clones from scratch.
+    """
+    try:
+        repo = git.Repo(local_path)
+        origin = repo.remotes.origin
+        if origin.url != clone_url:
+            return False
+        target = branch
+        if not target:
+            # Same branch a fresh clone would pick: the remote's default
+            head = repo.git.ls_remote("--symref", "origin", "HEAD").splitlines()[0]
+            target = head.split()[1].removeprefix("refs/heads/")
+        origin.fetch(f"+refs/heads/{target}:refs/remotes/origin/{target}", depth=1)
+        repo.git.checkout("-f", "-B", target, f"origin/{target}")
+        repo.git.clean("-fd")
+        return True
+    except Exception:
+        return False
+
+
+def _walk_tree(local_path: str) -> Tuple[List[str], List[str]]:
+    """Return (lintable files, ruff config files) under local_path, skipping IGNORE_DIRS.
+
+    Walks with an explicit `os.scandir` stack so each entry's type comes from the
+    directory listing, without extra stats.
+    """
+    files_found, config_files = [], []
+    ignore = set(IGNORE_DIRS)
+    stack = [local_path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ignore:
+                        stack.append(entry.path)
+                elif entry.name.endswith(LINT_SUFFIXES):
+                    files_found.append(entry.path)
+                elif entry.name in _RUFF_CONFIG_NAMES:
+                    config_files.append(entry.path)
+    return files_found, config_files
+
+
 def scan_files(local_path: str) -> List[str]:
-    """Return list of .py files under local_path (ignores common dirs).
+    """Return the files ruff lints (.py, .pyi, .ipynb) under local_path, ignoring common dirs.
 
-    Supports file discovery for linting.
+    `run_linter_and_store` uses this to fingerprint files against the lint cache;
+    ruff still walks the tree itself when nothing is cached.
     """
-    files_found = []
-    ignore = {'.git', '.venv', '__pycache__', 'node_modules'}
-    for root, dirs, files in os.walk(local_path):
-        dirs[:] = [d for d in dirs if d not in ignore]
-        for f in files:
-            if f.endswith(".py"):
-                files_found.append(os.path.join(root, f))
-    return files_found
+    return _walk_tree(local_path)[0]
+
+
+@functools.lru_cache(maxsize=1)
+def _ruff_version() -> str:
+    try:
+        return subprocess.run(["ruff", "--version"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _lint_config_key(local_path: str, config_files: List[str]) -> str:
+    """Hash the ruff version and the tree's config files, so cached results die with either."""
+    digest = hashlib.sha1(_ruff_version().encode("utf-8"))
+    for path in sorted(config_files):
+        digest.update(b"\0" + os.path.relpath(path, local_path).encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as fh:
+                digest.update(fh.read())
+        except OSError:
+            pass
+    return digest.hexdigest()
 
 
 def run_linter_and_store(local_path: str) -> str:
@@ -135,22 +218,84 @@ def run_linter_and_store(local_path: str) -> str:
     Returns:
         Human-readable error strings on failure or reference ID on success.
     """
+    # Reuse cached per-file results for files whose (mtime, size) and lint config have not changed
+    local_path = os.path.abspath(local_path)
+    lint_files, config_files = _walk_tree(local_path)
+    config_key = _lint_config_key(local_path, config_files)
+    fingerprints = {}
+    for path in lint_files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        fingerprints[path] = (st.st_mtime_ns, st.st_size)
+    cached = ARTIFACT_STORE.get_by_path_mtime(fingerprints, config_key)
+    stale = [p for p in fingerprints if p not in cached]
+    issues = [issue for file_issues in cached.values() for issue in file_issues]
+    if fingerprints and not stale:
+        return _store_report(issues, local_path)
+
+    # A cold run over a multi-package tree shards top-level packages across ruff processes
+    shards = [stale] if cached else _shard_subtrees(local_path, fingerprints)
     try:
-        proc = subprocess.run(
-            ["ruff", "check", local_path, "--output-format=json"],
-            capture_output=True, text=True, check=False
-        )
+        if len(shards) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(shards), os.cpu_count() or 1)) as pool:
+                fresh = [issue for part in pool.map(_ruff_subtree, shards) for issue in part]
+        else:
+            fresh = _ruff_subtree(shards[0])
     except FileNotFoundError:
         return "Error: Ruff linter not installed."
+    except json.JSONDecodeError:
+        return "Error: Linter output not valid JSON."
     except Exception as e:
         return f"Error running linter: {e}"
 
-    raw = proc.stdout.strip() or "[]"
-    try:
-        issues = json.loads(raw)
-    except json.JSONDecodeError:
-        return "Error: Linter output not valid JSON."
+    by_path = {p: [] for p in stale}
+    for issue in fresh:
+        by_path.setdefault(os.path.abspath(issue.get("filename", "")), []).append(issue)
+    ARTIFACT_STORE.put_file_issues({p: (fingerprints[p], by_path[p]) for p in stale}, config_key)
+    issues.extend(fresh)
+    return _store_report(issues, local_path)
+
+
+def _shard_subtrees(local_path: str, py_files) -> List[List[str]]:
+    """Split a tree into ruff targets: one per top-level package, plus root-level files.
+
+    Returns a single shard covering the whole tree unless at least two immediate
+    subdirectories contain Python files.
+    """
+    subdirs, root_files = set(), []
+    for path in py_files:
+        rel = os.path.relpath(path, local_path)
+        head, sep, _ = rel.partition(os.sep)
+        if sep:
+            subdirs.add(os.path.join(local_path, head))
+        else:
+            root_files.append(path)
+    if len(subdirs) < 2:
+        return [[local_path]]
+    shards = [[d] for d in sorted(subdirs)]
+    if root_files:
+        shards.append(root_files)
+    return shards
+
+
+def _ruff_subtree(targets: List[str]) -> List[dict]:
+    """Run ruff on targets and parse its json-lines output as it streams in."""
+    proc = subprocess.Popen(
+        ["ruff", "check", *targets, "--output-format=json-lines", "--force-exclude",
+         "--extend-exclude", ",".join(IGNORE_DIRS), "--cache-dir", RUFF_CACHE_DIR],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    with proc:
+        try:
+            return [loads(line) for line in proc.stdout if line.strip()]
+        except json.JSONDecodeError:
+            proc.kill()
+            raise
 
+
+def _store_report(issues: List[dict], local_path: str) -> str:
     if not issues:
         return "No issues found."
 
@@ -170,7 +315,7 @@ def fetch_issue_batch(report_id: str, batch_size: int = 3) -> str:
     if not data:
         return "Error: Report ID not found."
     batch = data.get("issues", [])[:batch_size]
-    return json.dumps(batch) if batch else "No more issues to fix."
+    return dumps(batch) if batch else "No more issues to fix."
 
 
 def write_file(file_path: str, content: str) -> str:
@@ -234,10 +379,8 @@ def display_artifact_changes(report_id: str) -> None:
 
 def _parse_github_owner_repo(url: str) -> Optional[tuple]:
     """Parse GitHub URL to extract owner and repo name."""
-    m = re.search(r"github\.com[:/](?P<owner>[^/]+)/(?P<repo>[^/.]+)", url or "")
-    if not m:
-        return None
-    return m.group("owner"), m.group("repo").replace(".git", "")
+    m = _GH_RE.search(url or "")
+    return (m.group("owner"), m.group("repo")) if m else None
 
 
 def create_github_pr(local_path: str, repo_url: str, github_token: str = "") -> str:
@@ -258,7 +401,7 @@ def create_github_pr(local_path: str, repo_url: str, github_token: str = "") ->
         return f"Error determining current branch: {e}"
 
     timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    safe_branch = re.sub(r'[^A-Za-z0-9._-]+', '-', current_branch).strip('-')
+    safe_branch = _BRANCH_SAFE_RE.sub('-', current_branch).strip('-')
     new_branch = f"fix-issues-{safe_branch}-{timestamp}"
 
     try:
@@ -279,18 +422,18 @@ def create_github_pr(local_path: str, repo_url: str, github_token: str = "") ->
     owner, repo_name = (owner_repo + (None,))[:2] if owner_repo else (None, None)
 
     auth_user = None
-    headers = {"Accept": "application/vnd.github+json"}
+    headers = {}
     if github_token and owner and repo_name:
         headers["Authorization"] = f"token {github_token}"
         try:
-            uresp = requests.get("https://api.github.com/user", headers=headers, timeout=10)
+            uresp = _GH.get("https://api.github.com/user", headers=headers, timeout=10)
             if uresp.status_code == 200:
                 auth_user = uresp.json().get("login")
             else:
                 return f"Error: token authentication failed: {uresp.status_code} {uresp.text}"
             # quick permission check
             repo_api = f"https://api.github.com/repos/{owner}/{repo_name}"
-            resp = requests.get(repo_api, headers=headers, timeout=10)
+            resp = _GH.get(repo_api, headers=headers, timeout=10)
             if resp.status_code == 200:
                 perms = resp.json().get("permissions", {})
                 if not perms.get("push", False):
@@ -347,9 +490,9 @@ def create_github_pr(local_path: str, repo_url: str, github_token: str = "") ->
     # prefer current_branch as base, fallback to repo default if needed
     base_branch = current_branch
     try:
-        br_resp = requests.get(f"https://api.github.com/repos/{owner}/{repo_name}/branches/{base_branch}", headers=headers, timeout=10)
+        br_resp = _GH.get(f"https://api.github.com/repos/{owner}/{repo_name}/branches/{base_branch}", headers=headers, timeout=10)
         if br_resp.status_code != 200:
-            repo_meta = requests.get(f"https://api.github.com/repos/{owner}/{repo_name}", headers=headers, timeout=10)
+            repo_meta = _GH.get(f"https://api.github.com/repos/{owner}/{repo_name}", headers=headers, timeout=10)
             if repo_meta.status_code == 200:
                 base_branch = repo_meta.json().get("default_branch") or base_branch
     except Exception:
@@ -358,7 +501,7 @@ def create_github_pr(local_path: str, repo_url: str, github_token: str = "") ->
     head_branch = new_branch
     try:
         if auth_user and auth_user != owner:
-            check_upstream = requests.get(f"https://api.github.com/repos/{owner}/{repo_name}/branches/{new_branch}", headers=headers, timeout=10)
+            check_upstream = _GH.get(f"https://api.github.com/repos/{owner}/{repo_name}/branches/{new_branch}", headers=headers, timeout=10)
             if check_upstream.status_code != 200:
                 head_branch = f"{auth_user}:{new_branch}"
     except Exception:
@@ -367,12 +510,14 @@ def create_github_pr(local_path: str, repo_url: str, github_token: str = "") ->
     api_url = f"https://api.github.com/repos/{owner}/{repo_name}/pulls"
     payload = {"title": f"Auto-fix: {new_branch}", "head": head_branch, "base": base_branch, "body": "Automated fixes created by tool."}
     try:
-        resp = requests.post(api_url, json=payload, headers=headers, timeout=15)
+        resp = _GH.post(
+            api_url, data=dumpb(payload), headers={**headers, "Content-Type": "application/json"}, timeout=15
+        )
     except Exception as e:
         return f"Error calling GitHub API to create PR: {e}"
 
     if resp.status_code in (200, 201):
-        pr = resp.json()
+        pr = loads(resp.content)
         pr_url = pr.get("html_url", str(pr))
         try:
             repo.git.checkout(current_branch)
@@ -1,26 +1,88 @@
+import asyncio
 import re
+import time
 try:
     from google.genai.agents import Runner
 except Exception:
-    import importlib.util, os
-    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    agents_path = os.path.join(base, "google", "genai", "agents.py")
-    spec = importlib.util.spec_from_file_location("google.genai.agents", agents_path)
-    agents_mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(agents_mod)
-    Runner = agents_mod.Runner
+    # core.agent_runtime loads the bundled stub once and registers it in sys.modules
+    from core.agent_runtime import Runner
 
 from core.agent_runtime import build_session_service, run_agent, ensure_dir
 from core.config import TEMP_REPOS_DIR
-from core.git_utils import clone_repo, create_branch_and_push, MergeConflictError, write_file
-from git import Repo
+from core.logging_utils import flush_logs, get_logger
+from core import repo_cache
+from core.git_utils import create_branch_and_push, MergeConflictError, write_file_bytes
 from urllib.parse import urlparse
 from agents.analysis_agent import analyze_repo_for_issues, run_bandit_on_path, compute_confidence
 from agents.fix_agent import fix_issues_with_llm, generate_code_from_requirement
-from agents.publish_agent import create_pull_request, create_issue, post_pr_comment
-from agents.semantic_agent import run_semantic_refactor
+from agents.publish_agent import create_pr_new_branch, create_issue, generate_pr_review_comment_local, post_pr_comment
 from core.artifacts import store_issues
 
+# GitHub Actions workflow written when ci_integration is enabled
+_CI_WORKFLOW_BYTES = b"""name: CI
+
+on: [push, pull_request]
+
+jobs:
+  lint:
+    runs-on: ubuntu-latest
+    steps:
+      - uses: actions/checkout@v4
+      - name: Set up Python
+        uses: actions/setup-python@v4
+        with:
+          python-version: '3.11'
+      - name: Install ruff
+        run: pip install ruff
+      - name: Run ruff
+        run: ruff check .
+"""
+
+log = get_logger("pipeline")
+
+# Reported for the semantic_refactor option until deeper refactoring exists
+SEMANTIC_REFACTOR_RESULT = "No semantic refactors performed."
+
+_UUID_RE = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+
+
+# Static parts of the heuristic review comment
+_FALLBACK_REVIEW_HEADER = "Automated Review by Patcher\n\n"
+_FALLBACK_REVIEW_SUMMARY = "**Summary:**\n- Code changes were auto-generated by Patcher to address the requirement.\n"
+_FALLBACK_REVIEW_FOOTER = (
+    "\n**Next Steps:**\n1. Review the changes in this PR\n2. Run your test suite to verify compatibility\n"
+    "3. Merge when ready\n\n---\nCreated by Patcher AI\n"
+)
+
+
+def _fallback_review_body(pr_requirement, generated_files, bandit_report_id) -> str:
+    """Heuristic review comment used when the AI review cannot be generated."""
+    parts = [_FALLBACK_REVIEW_HEADER]
+    if pr_requirement:
+        parts.append(f"**Requirement:** {pr_requirement}\n\n")
+    if generated_files:
+        parts.append("**Generated Files:**\n")
+        parts.extend(f"- {p}\n" for p in generated_files)
+        parts.append("\n")
+    parts.append(_FALLBACK_REVIEW_SUMMARY)
+    if bandit_report_id:
+        parts.append(f"- Security scan complete (Bandit report: {bandit_report_id})\n")
+    parts.append(_FALLBACK_REVIEW_FOOTER)
+    return "".join(parts)
+
+
+async def _emit_drainer(emit_q: asyncio.Queue, progress_callback) -> None:
+    """Deliver queued (stage, info) events to the callback in order, off the event loop."""
+    while True:
+        stage, info = await emit_q.get()
+        try:
+            await asyncio.to_thread(progress_callback, stage, info)
+        except Exception:
+            pass
+        finally:
+            emit_q.task_done()
+
+
 async def run_pipeline(
     repo_url: str,
     gh_token: str,
@@ -39,11 +101,62 @@ async def run_pipeline(
 
     progress_callback: optional callable(stage: str, info: str|None) used to emit
     stage updates (e.g. "analyze:start", "analyze:done", "fix:start", etc.).
+    "analyze:report" carries the issues artifact ID the rest of the run works from.
+    Events are queued and delivered by a background task, so a slow callback never
+    blocks the pipeline; all of them have been delivered by the time this returns.
+    The same holds for log output, which is written by a background thread.
     
     pr_requirement: optional string describing what the PR should fix/improve.
                    If provided, Patcher will generate code based on this requirement
                    instead of running auto-linting.
     """
+    options = dict(
+        security_lint=security_lint,
+        pr_review_comments=pr_review_comments,
+        ci_integration=ci_integration,
+        confidence_scoring=confidence_scoring,
+        semantic_refactor=semantic_refactor,
+        auto_create_pr=auto_create_pr,
+        pr_requirement=pr_requirement,
+        # Working copies this run checks out; each one is deleted once the run is over
+        checkouts=[],
+    )
+    try:
+        if progress_callback is None:
+            return await _run_pipeline(repo_url, gh_token, base_branch, None, **options)
+
+        emit_q: asyncio.Queue = asyncio.Queue()
+        drainer = asyncio.create_task(_emit_drainer(emit_q, progress_callback))
+        try:
+            return await _run_pipeline(
+                repo_url, gh_token, base_branch, lambda stage, info: emit_q.put_nowait((stage, info)), **options
+            )
+        finally:
+            await emit_q.join()
+            drainer.cancel()
+    finally:
+        for clone_res in options["checkouts"]:
+            await asyncio.to_thread(repo_cache.discard, clone_res)
+        # Log lines are written by a background thread; make sure they reach the
+        # caller's stdout before it gets restored
+        await asyncio.to_thread(flush_logs)
+
+
+async def _run_pipeline(
+    repo_url: str,
+    gh_token: str,
+    base_branch: str,
+    progress_callback,
+    *,
+    security_lint: bool,
+    pr_review_comments: bool,
+    ci_integration: bool,
+    confidence_scoring: bool,
+    semantic_refactor: bool,
+    auto_create_pr: bool,
+    pr_requirement: str,
+    checkouts: list,
+):
     def emit(stage: str, info: str | None = None):
         try:
             if progress_callback:
@@ -98,15 +211,19 @@ async def run_pipeline(
 
     _emit("clone:start")
     try:
-        local_path = clone_repo(repo_url, TEMP_REPOS_DIR, base_branch or None, github_token=gh_token)
+        # Clone/fetch and the other git and lint steps below block, and the event loop may be
+        # shared with other runs (see app.py), so they all run in worker threads
+        clone_res = await asyncio.to_thread(repo_cache.checkout, repo_url, base_branch or None, github_token=gh_token)
+        checkouts.append(clone_res)
+        local_path = clone_res.path
     except RuntimeError as clone_err:
         error_msg = str(clone_err)
-        print(f"[Pipeline] ❌ Clone failed: {error_msg}")
+        log.error("[Pipeline] ❌ Clone failed: %s", error_msg)
         _emit("clone:error", error_msg)
         return {"status": "failed", "reason": "clone_error", "detail": error_msg}
     except Exception as e:
         error_msg = f"Unexpected error during clone: {str(e)}"
-        print(f"[Pipeline] ❌ {error_msg}")
+        log.error("[Pipeline] ❌ %s", error_msg)
         _emit("clone:error", error_msg)
         return {"status": "failed", "reason": "clone_error", "detail": error_msg}
     
@@ -125,10 +242,21 @@ async def run_pipeline(
     bandit_report_id = None
     generated_files = None
 
+    # Bandit only reads the checkout, so it runs in a worker thread alongside the
+    # analysis and is awaited before the fix stage writes files
+    security_task = None
+    if security_lint:
+        _emit("security:start", "Running Bandit security scan")
+        security_task = asyncio.create_task(asyncio.to_thread(run_bandit_on_path, local_path))
+    if semantic_refactor:
+        # Deeper semantic refactoring is not implemented yet
+        _emit("semantic:start")
+        _emit("semantic:done", SEMANTIC_REFACTOR_RESULT)
+
     # Requirement analysis (if provided)
     if pr_requirement:
         _emit("requirement:start", f"Processing requirement: {pr_requirement[:60]}...")
-        print(f"\n[Requirements] User requirement: {pr_requirement}")
+        log.info("\n[Requirements] User requirement: %s", pr_requirement)
         # Create an artifact entry (empty issues) so downstream stages have a valid report id
         report_id = store_issues([], local_path)
         analysis_output = f"Requirement: {pr_requirement}\nReference ID: {report_id}"
@@ -140,60 +268,56 @@ async def run_pipeline(
 
         # Analyze
         _emit("analyze:start")
-        print("\n[Analyzer]: Analyzing...")
-        analysis_output = analyze_repo_for_issues(local_path)
-        print("Analysis:", analysis_output)
+        log.info("\n[Analyzer]: Analyzing...")
+        analysis_output = await asyncio.to_thread(analyze_repo_for_issues, local_path)
+        log.info("Analysis: %s", analysis_output)
         _emit("analyze:done", analysis_output)
         _emit("lint:done", analysis_output)
         _emit("scan:done", local_path)
 
     # Optional security linting
-    if security_lint:
-        _emit("security:start", "Running Bandit security scan")
+    if security_task:
         try:
-            bandit_report_id = run_bandit_on_path(local_path)
+            bandit_report_id = await security_task
             _emit("security:done", bandit_report_id)
         except Exception as e:
             emit("security:error", str(e))
 
-    # Optional deeper semantic refactoring
-    if semantic_refactor:
-        _emit("semantic:start")
-        sem_out = run_semantic_refactor(local_path)
-        _emit("semantic:done", sem_out)
-
-    # Parse analysis output to get report ID
-    match = re.search(r"([a-f0-9\-]{36})", analysis_output)
-    if not match:
+    # Parse analysis output to get report ID (the requirement path already has one)
+    match = None if report_id else _UUID_RE.search(analysis_output)
+    if report_id:
+        log.info("Artifact ID: %s", report_id)
+    elif not match:
         # If analysis output did not include a reference ID, create a fallback empty report
-        print("Warning: No Reference ID returned from analysis. Creating empty artifact to continue pipeline.")
+        log.warning("Warning: No Reference ID returned from analysis. Creating empty artifact to continue pipeline.")
         try:
-            from core.artifacts import store_issues as _store
-            fallback_id = _store([], local_path)
+            fallback_id = store_issues([], local_path)
             report_id = fallback_id
             _emit("analyze:warning", f"No report id found; created fallback id {report_id}")
-            print(f"Artifact fallback ID: {report_id}")
+            log.info("Artifact fallback ID: %s", report_id)
         except Exception as e:
-            print(f"Failed to create fallback artifact: {e}")
+            log.error("Failed to create fallback artifact: %s", e)
             return {"status": "failed", "reason": "no_analysis_report", "detail": str(e)}
     else:
-        report_id = match.group(1)
-        print(f"Artifact ID: {report_id}")
+        report_id = match.group(0)
+        log.info("Artifact ID: %s", report_id)
+    _emit("analyze:report", report_id)
 
     # Fix / Generate code
     _emit("generate:start", report_id)
     _emit("fix:start", report_id)
-    print("\n[Fixer]: Processing...")
+    log.info("\n[Fixer]: Processing...")
+    fixed_files = None  # path -> new content, so confidence only re-lints what changed
     try:
         if pr_requirement:
             # Requirement-based code generation
             generated_files = await generate_code_from_requirement(runner_fix, session_id, local_path, pr_requirement)
         else:
             # Normal linting-based fixes
-            await fix_issues_with_llm(runner_fix, session_id, report_id)
+            fixed_files = await fix_issues_with_llm(runner_fix, session_id, report_id)
         _emit("fix:done", report_id)
     except Exception as e:
-        print(f"[Fixer] Error: {e}")
+        log.error("[Fixer] Error: %s", e)
         emit("fix:error", str(e))
     _emit("generate:done", report_id)
     _emit("apply:done", report_id)
@@ -203,7 +327,7 @@ async def run_pipeline(
     if confidence_scoring:
         _emit("confidence:start")
         try:
-            confidence_result = compute_confidence(report_id, local_path)
+            confidence_result = await asyncio.to_thread(compute_confidence, report_id, local_path, changed_files=fixed_files)
             _emit("confidence:done", confidence_result)
         except Exception as e:
             emit("confidence:error", str(e))
@@ -212,26 +336,8 @@ async def run_pipeline(
     if ci_integration:
         emit("ci:start")
         try:
-            workflow = """name: CI
-
-on: [push, pull_request]
-
-jobs:
-  lint:
-    runs-on: ubuntu-latest
-    steps:
-      - uses: actions/checkout@v4
-      - name: Set up Python
-        uses: actions/setup-python@v4
-        with:
-          python-version: '3.11'
-      - name: Install ruff
-        run: pip install ruff
-      - name: Run ruff
-        run: ruff check .
-"""
             wf_path = f"{local_path}/.github/workflows/auto-patch.yml"
-            write_file(wf_path, workflow)
+            await asyncio.to_thread(write_file_bytes, wf_path, _CI_WORKFLOW_BYTES)
             _emit("ci:done", wf_path)
         except Exception as e:
             emit("ci:error", str(e))
@@ -239,39 +345,36 @@ jobs:
 
     # Publish
     _emit("publish:start")
-    print("\n[Publisher]: Publishing...")
-    import time
+    log.info("\n[Publisher]: Publishing...")
     timestamp = int(time.time())
     new_branch = f"auto-style-fixes-{timestamp}"
     _emit("commit:start", new_branch)
     try:
         # Safety: ensure the repo we're about to push to matches the repo URL provided
-        try:
-            repo_obj = Repo(local_path)
-            origin_url = (repo_obj.remotes.origin.url or "").rstrip("/").replace(".git", "")
-            provided = (repo_url or "").rstrip("/").replace(".git", "")
-        except Exception as check_err:
-            origin_url = None
-            provided = (repo_url or "").rstrip("/").replace(".git", "")
-            print(f"[Safety] Warning: Could not verify origin: {check_err}")
+        # (the checkout reports the origin it set, so no need to re-open the repo)
+        origin_url = (clone_res.origin_url or "").rstrip("/").replace(".git", "")
+        provided = (repo_url or "").rstrip("/").replace(".git", "")
 
         if origin_url and provided:
             if origin_url != provided:
                 err = f"Refusing to push: cloned repo origin ({origin_url}) does not match provided repo URL ({provided})"
-                print(f"[Safety] ❌ CRITICAL: {err}")
+                log.error("[Safety] ❌ CRITICAL: %s", err)
                 _emit("push:error", err)
                 return {"status": "failed", "reason": "repo_mismatch", "detail": err}
-            print(f"[Safety] ✅ Verified: will push to {provided}")
+            log.info("[Safety] ✅ Verified: will push to %s", provided)
 
-        created_branch = create_branch_and_push(local_path, new_branch, gh_token, files_to_add=generated_files or None, commit_message=(pr_requirement if pr_requirement else None), expected_origin=repo_url)
+        created_branch = await asyncio.to_thread(
+            create_branch_and_push, local_path, new_branch, gh_token, files_to_add=generated_files or None,
+            commit_message=(pr_requirement if pr_requirement else None), expected_origin=repo_url,
+        )
         _emit("commit:done", created_branch)
         _emit("push:done", created_branch)
     except MergeConflictError as e:
         _emit("push:conflict", str(e))
         # create an issue to notify the 'cloner' about the conflict
         try:
-            issue_url = create_issue(repo_url, "Merge conflicts detected by AutoPatch",
-                                     f"Merge conflicts detected when pushing branch {new_branch}: {e}", gh_token)
+            issue_url = await asyncio.to_thread(create_issue, repo_url, "Merge conflicts detected by AutoPatch",
+                                                f"Merge conflicts detected when pushing branch {new_branch}: {e}", gh_token)
             emit("cloner:notify", issue_url)
         except Exception:
             pass
@@ -288,21 +391,25 @@ jobs:
         _emit("prreview:error", str(e))
         return {"status": "failed", "reason": "push_error", "detail": str(e)}
 
-    # Branch created successfully
-    _emit("publish:start")
-    pr_url = None
-    
+    # Branch created successfully. The review only needs the pushed commit, so the LLM
+    # works on it from the local diff while the PR is being created
+    review_task = None
+    if pr_review_comments:
+        log.info("[Patcher] Generating AI-based review comment...")
+        review_task = asyncio.create_task(
+            generate_pr_review_comment_local(runner_analyze, session_id, local_path, clone_res.head_sha)
+        )
+
     # Auto-create PR (always enabled - Patcher always creates PRs)
-    pr_url = None
     try:
-        print("[Publisher] Creating pull request...")
+        log.info("[Publisher] Creating pull request...")
         
         # Determine PR title and body based on requirement or auto-fixes
         if pr_requirement:
             # Requirement-driven PR
             pr_title = f"feat: {pr_requirement[:60]}" if len(pr_requirement) > 0 else "feat: AI-generated improvements"
             files_section = ""
-            if 'generated_files' in locals() and generated_files:
+            if generated_files:
                 files_section = "\n**Files Generated:**\n" + "\n".join([f"- `{p}`" for p in generated_files]) + "\n"
             pr_body = f"""Patcher - AI-Powered Auto-Generated Fixes
 
@@ -319,7 +426,10 @@ Created by Patcher AI
             # Auto-linting PR
             pr_title = "chore: auto style fixes"
             pr_body = "🤖 **Patcher** - Automated code style fixes\n\nThis PR was created by the Patcher bot to fix code style issues detected in your repository."
-        pr_url = create_pull_request(
+        # GitHub calls are blocking; keep them off the event loop
+        pr_url = await asyncio.to_thread(
+            # created_branch is timestamped, so it cannot have a PR yet
+            create_pr_new_branch,
             repo_url=repo_url,
             new_branch=created_branch,
             base_branch=base_branch or "main",
@@ -327,52 +437,37 @@ Created by Patcher AI
             title=pr_title,
             body=pr_body,
         )
-        print(f"[Publisher] PR created successfully: {pr_url}")
+        log.info("[Publisher] PR created successfully: %s", pr_url)
         _emit("pr:created", pr_url)
     except Exception as e:
         error_msg = f"Failed to create PR: {str(e)}"
-        print(f"[Publisher] PR creation failed: {error_msg}")
+        log.error("[Publisher] PR creation failed: %s", error_msg)
         _emit("pr:error", error_msg)
         pr_url = None
     
-    emit("publish:done", pr_url or created_branch)
+    _emit("publish:done", pr_url or created_branch)
 
 
     # Auto-review (if requested)
     if pr_review_comments:
         try:
             if not pr_url:
-                print("[Publisher] ❌ Cannot post PR review - no PR created")
+                review_task.cancel()
+                log.error("[Publisher] ❌ Cannot post PR review - no PR created")
                 _emit("prreview:error", "Cannot review PR - PR creation failed")
             else:
-                print("[Patcher] Generating AI-based review comment...")
                 try:
-                    from agents.publish_agent import generate_pr_review_comment
-                    # Use the analyze runner if available
-                    runner_to_use = runner_analyze if 'runner_analyze' in locals() else runner_fix
-                    comment_body = await generate_pr_review_comment(runner_to_use, session_id, pr_url, repo_url, gh_token)
+                    comment_body = await review_task
                 except Exception as gen_err:
-                    print(f"[Patcher] AI review generation failed, using fallback: {gen_err}")
-                    # Fallback to heuristic comment
-                    comment_body = f"Automated Review by Patcher\n\n"
-                    if pr_requirement:
-                        comment_body += f"**Requirement:** {pr_requirement}\n\n"
-                    if generated_files:
-                        comment_body += "**Generated Files:**\n"
-                        for p in generated_files:
-                            comment_body += f"- {p}\n"
-                        comment_body += "\n"
-                    comment_body += "**Summary:**\n- Code changes were auto-generated by Patcher to address the requirement.\n"
-                    if bandit_report_id:
-                        comment_body += f"- Security scan complete (Bandit report: {bandit_report_id})\n"
-                    comment_body += "\n**Next Steps:**\n1. Review the changes in this PR\n2. Run your test suite to verify compatibility\n3. Merge when ready\n\n---\nCreated by Patcher AI\n"
-
-                post_pr_comment(pr_url, comment_body, gh_token)
-                print(f"[Patcher] Review comment posted")
+                    log.warning("[Patcher] AI review generation failed, using fallback: %s", gen_err)
+                    comment_body = _fallback_review_body(pr_requirement, generated_files, bandit_report_id)
+
+                await asyncio.to_thread(post_pr_comment, pr_url, comment_body, gh_token)
+                log.info("[Patcher] Review comment posted")
                 _emit("prreview:done", pr_url)
         except Exception as e:
             error_msg = f"Failed to post review comment: {str(e)}"
-            print(f"[Patcher] PR review failed: {error_msg}")
+            log.error("[Patcher] PR review failed: %s", error_msg)
             _emit("prreview:error", error_msg)
     else:
         _emit("prreview:done", "Review not requested")
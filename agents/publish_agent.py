@@ -1,11 +1,93 @@
+import asyncio
+import functools
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from urllib.parse import urlparse
 import requests
+from git import Repo
 from core.git_utils import create_branch_and_push
-from typing import Optional
+from core.github_graphql import fetch_pr_files_batch
+from core.http_client import GITHUB_SESSION
+from core.json_utils import dumpb, loads
+from core.logging_utils import get_logger
+from typing import Any, NamedTuple, Optional
 try:
     from core.agent_runtime import run_agent
 except Exception:
     run_agent = None
 
+log = get_logger("publish")
+
+# The shared GitHub session, plus a small executor for requests that are issued
+# speculatively alongside another one
+_session = GITHUB_SESSION
+_prefetch = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gh-prefetch")
+# (url, params) -> (stored at, ETag, parsed body) of recent GETs. Repeat GETs send the ETag
+# back and reuse the body on a 304, which GitHub does not count against the rate limit.
+# Entries are dropped after _GET_CACHE_TTL seconds or when there are too many.
+_GET_CACHE_TTL = 300
+_GET_CACHE_MAX = 512
+_get_cache: "OrderedDict[tuple, tuple[float, str, Any]]" = OrderedDict()
+_get_cache_lock = threading.Lock()
+
+
+class _RepoRef(NamedTuple):
+    owner: str
+    repo: str
+    owner_repo: str
+    api_base: str
+
+
+def _repo_ref(owner: str, repo: str) -> _RepoRef:
+    owner_repo = f"{owner}/{repo}"
+    return _RepoRef(owner, repo, owner_repo, f"https://api.github.com/repos/{owner_repo}")
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_repo_url(repo_url: str) -> _RepoRef:
+    """Parse a repo URL like https://github.com/owner/repo.git."""
+    clean = repo_url.rstrip("/").replace(".git", "")
+    owner, _, repo = clean.split("github.com/")[-1].partition("/")
+    return _repo_ref(owner, repo)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_pr_url(pr_url: str) -> tuple[_RepoRef, str]:
+    """Return (repo, pr_number) for a URL like https://github.com/owner/repo/pull/123."""
+    parts = urlparse(pr_url).path.strip("/").split("/")
+    if len(parts) < 4:
+        raise ValueError("Invalid PR URL")
+    owner, repo, _, pr_number = parts[:4]
+    return _repo_ref(owner, repo), pr_number
+
+
+@functools.lru_cache(maxsize=16)
+def _gh_headers(gh_token: str) -> MappingProxyType:
+    """Read-only GitHub API headers, with auth only when a token is given."""
+    headers = {"Accept": "application/vnd.github+json"}
+    if gh_token:
+        headers["Authorization"] = f"token {gh_token}"
+    return MappingProxyType(headers)
+
+
+@functools.lru_cache(maxsize=16)
+def _gh_json_headers(gh_token: str) -> MappingProxyType:
+    """`_gh_headers` plus the Content-Type of a JSON request body."""
+    return MappingProxyType({**_gh_headers(gh_token), "Content-Type": "application/json"})
+
+
+def _post_json(api_url: str, gh_token: str, payload: dict) -> requests.Response:
+    """POST payload to the GitHub API, serialised once to bytes (orjson when available)."""
+    return _session.post(api_url, headers=_gh_json_headers(gh_token), data=dumpb(payload), timeout=15)
+
+
+# GitHub's maximum page size for the PR files endpoint
+_FILES_PER_PAGE = 100
+
 
 async def generate_pr_review_comment(
     runner,
@@ -14,70 +96,216 @@ async def generate_pr_review_comment(
     repo_url: Optional[str],
     gh_token: str,
     max_files: int = 8,
+    files: Optional[list] = None,
 ) -> str:
     """Generate an AI-based PR review comment using the provided `runner`.
 
-    Falls back to a heuristic summary if no runner is available.
+    Falls back to a heuristic summary if no runner is available. Pass `files` (entries
+    shaped like GitHub's "list PR files" response) to skip fetching them.
     """
+    if files is not None:
+        return await _review_from_files(runner, session_id, files, max_files)
+
     # Simple helper to fetch PR files
     try:
-        parts = pr_url.rstrip("/").split("/")
-        pr_number = parts[-1]
-        owner_repo = "/".join(parts[-4:-2])
+        ref, pr_number = _parse_pr_url(pr_url)
     except Exception:
         return "Automated review: could not parse PR URL to generate review."
 
-    api_url = f"https://api.github.com/repos/{owner_repo}/pulls/{pr_number}/files"
-    headers = {"Accept": "application/vnd.github+json"}
-    if gh_token:
-        headers["Authorization"] = f"token {gh_token}"
+    pr_api = f"{ref.api_base}/pulls/{pr_number}"
+    headers = _gh_headers(gh_token)
 
     try:
-        resp = requests.get(api_url, headers=headers, timeout=15)
-        if resp.status_code != 200:
-            return f"Automated review: failed to fetch PR files (status {resp.status_code})."
-        files = resp.json()
+        # Off the event loop: this runs inside the async pipeline. Only the first max_files
+        # files are reviewed, so only those are fetched; the PR object has the file and line totals
+        (status, files), (_, pr) = await asyncio.gather(
+            asyncio.to_thread(_cached_get, f"{pr_api}/files", headers, {"per_page": min(max_files, _FILES_PER_PAGE)}),
+            asyncio.to_thread(_cached_get, pr_api, headers),
+        )
+        if status != 200:
+            return f"Automated review: failed to fetch PR files (status {status})."
     except Exception:
         return "Automated review: failed to fetch PR files."
 
+    return await _review_from_files(runner, session_id, files, max_files, pr)
+
+
+async def generate_pr_reviews_bulk(
+    runner,
+    session_id: str,
+    pr_urls: list[str],
+    gh_token: str,
+    max_files: int = 8,
+) -> dict[str, str]:
+    """Generate review comments for many PRs, fetching all of their files in one GraphQL call.
+
+    GraphQL has no per-file patches, so these reviews go without diff snippets. PRs the
+    batch could not resolve (or every PR, without a token) fall back to the REST fetch of
+    `generate_pr_review_comment`. Returns {pr_url: comment}.
+    """
+    refs = {}
+    for url in pr_urls:
+        try:
+            ref, pr_number = _parse_pr_url(url)
+            refs[url] = (ref.owner, ref.repo, int(pr_number))
+        except ValueError:
+            refs[url] = None
+
+    batch = {}
+    if gh_token and any(refs.values()):
+        try:
+            batch = await asyncio.to_thread(
+                fetch_pr_files_batch, [r for r in refs.values() if r], gh_token, _session
+            )
+        except Exception as e:
+            log.warning("[Review] Batched PR files fetch failed: %s, fetching per PR", e)
+
+    comments = await asyncio.gather(
+        *(
+            generate_pr_review_comment(
+                runner, session_id, url, None, gh_token, max_files, files=batch.get(ref) if ref else None
+            )
+            for url, ref in refs.items()
+        )
+    )
+    return dict(zip(refs, comments))
+
+
+# How much of each file's diff goes into the review prompt
+_SNIPPET_LINES = 4
+_SNIPPET_MAX_CHARS = 400
+
+_GIT_STATUS = {"A": "added", "D": "deleted", "M": "modified", "R": "renamed", "C": "copied"}
+
+
+def _local_changed_files(repo_path: str, base_sha: str, max_files: int) -> list[dict]:
+    """Describe base_sha..HEAD in the shape of GitHub's "list PR files" response."""
+    repo = Repo(repo_path)
+    files = []
+    numstat = repo.git.diff("--numstat", "--no-renames", base_sha, "HEAD").splitlines()
+    statuses = repo.git.diff("--name-status", "--no-renames", base_sha, "HEAD").splitlines()
+    for num_line, status_line in zip(numstat, statuses):
+        additions, deletions, filename = num_line.split("\t", 2)
+        entry = {
+            "filename": filename,
+            "status": _GIT_STATUS.get(status_line[:1], "modified"),
+            # Binary files report "-" for both counts
+            "additions": int(additions) if additions.isdigit() else 0,
+            "deletions": int(deletions) if deletions.isdigit() else 0,
+        }
+        entry["changes"] = entry["additions"] + entry["deletions"]
+        if len(files) < max_files:
+            entry["patch"] = _patch_head(repo, base_sha, filename)
+        files.append(entry)
+    return files
+
+
+def _patch_head(repo: Repo, base_sha: str, filename: str) -> str:
+    """First `_SNIPPET_LINES` lines of a file's diff from its first hunk header, as GitHub's
+    `patch` starts; git's output is streamed and abandoned after that, however big the diff."""
+    proc = repo.git.diff(base_sha, "HEAD", "--", filename, as_process=True)
+    try:
+        lines = (raw.decode("utf-8", "replace") for raw in proc.stdout)
+        hunks = itertools.dropwhile(lambda line: not line.startswith("@@"), lines)
+        return "".join(itertools.islice(hunks, _SNIPPET_LINES))
+    finally:
+        proc.proc.kill()
+        proc.proc.wait()
+
+
+async def generate_pr_review_comment_local(
+    runner,
+    session_id: str,
+    repo_path: str,
+    base_sha: str,
+    max_files: int = 8,
+) -> str:
+    """Like `generate_pr_review_comment`, but reads the changes from the local checkout.
+
+    Only needs the pushed commit (base_sha..HEAD), so it can run before the PR exists.
+    """
+    try:
+        files = await asyncio.to_thread(_local_changed_files, repo_path, base_sha, max_files)
+    except Exception:
+        return "Automated review: failed to read local changes."
+    return await _review_from_files(runner, session_id, files, max_files)
+
+
+# Prompt for the AI review; {files} is filled with the per-file summaries
+_REVIEW_PROMPT = (
+    "You are an expert code reviewer. Given the list of changed files and diffs below, "
+    "produce a clear, concise review comment that:\n"
+    "1. Summarizes the main changes (2-3 sentences)\n"
+    "2. Points out any potential bugs or risky changes\n"
+    "3. Suggests improvements if applicable\n"
+    "4. Provides a brief acceptance checklist (3-4 items)\n\n"
+    "Be professional, constructive, and encouraging.\n\n"
+    "### Changed Files:\n{files}"
+)
+
+# Static tail of the fallback review comment
+_REVIEW_FOOTER = (
+    "\n**Review Checklist:**\n"
+    "- [ ] Code follows project style guidelines\n"
+    "- [ ] Changes are well-documented\n"
+    "- [ ] Tests cover new functionality\n"
+    "- [ ] No breaking changes introduced\n\n"
+    "---\n*This is an automated review. Please review the actual changes and test thoroughly before merging.*"
+)
+
+
+async def _review_from_files(runner, session_id: str, files: list, max_files: int,
+                             pr: Optional[dict] = None) -> str:
+    """Review the first max_files of files.
+
+    When files is only the start of the PR's file list, pass the PR object as `pr`: its
+    changed_files/additions/deletions give the totals, and the per-status counts are
+    labelled as covering just the files listed.
+    """
     if not files:
         return "Automated review: No files changed in this PR."
 
-    # Build a concise summary of changed files and small diffs
+    # Build a concise summary of changed files and small diffs. Stats cover every file
+    # given; only the first max_files also get a summary entry
     summary_lines = []
-    file_stats = {"added": 0, "modified": 0, "deleted": 0, "total_additions": 0, "total_deletions": 0}
-    
-    for f in files[:max_files]:
-        filename = f.get("filename", "unknown")
-        changes = f.get("changes", 0)
+    added = modified = deleted = total_additions = total_deletions = 0
+    for i, f in enumerate(files):
         additions = f.get("additions", 0)
         deletions = f.get("deletions", 0)
         status = f.get("status", "modified").lower()
-        
-        # Track file stats
-        file_stats["total_additions"] += additions
-        file_stats["total_deletions"] += deletions
+        total_additions += additions
+        total_deletions += deletions
         if status == "added":
-            file_stats["added"] += 1
-        elif status == "deleted":
-            file_stats["deleted"] += 1
+            added += 1
+        elif status in ("deleted", "removed"):  # REST says "removed", git and GraphQL "deleted"
+            deleted += 1
         else:
-            file_stats["modified"] += 1
-        
+            modified += 1
+        if i >= max_files:
+            continue
+
         patch = f.get("patch") or ""
-        snippet = "\n".join(patch.splitlines()[:4]) if patch else "(no diff available)"
-        summary_lines.append(f"**{filename}** ({status}): +{additions} / -{deletions}\n```\n{snippet}\n```")
-
-    prompt = (
-        "You are an expert code reviewer. Given the list of changed files and diffs below, "
-        "produce a clear, concise review comment that:\n"
-        "1. Summarizes the main changes (2-3 sentences)\n"
-        "2. Points out any potential bugs or risky changes\n"
-        "3. Suggests improvements if applicable\n"
-        "4. Provides a brief acceptance checklist (3-4 items)\n\n"
-        "Be professional, constructive, and encouraging.\n\n"
-        "### Changed Files:\n" + "\n".join(summary_lines)
-    )
+        # Split off only the first few lines (maxsplit), not every line of a possibly huge patch,
+        # and cap their length so minified or generated files cannot bloat the prompt
+        snippet = "\n".join(patch.split("\n", _SNIPPET_LINES)[:_SNIPPET_LINES]).rstrip("\n")[:_SNIPPET_MAX_CHARS] if patch else "(no diff available)"
+        summary_lines.append(f"**{f.get('filename', 'unknown')}** ({status}): +{additions} / -{deletions}\n```\n{snippet}\n```")
+    file_stats = {
+        "added": added,
+        "modified": modified,
+        "deleted": deleted,
+        "total_additions": total_additions,
+        "total_deletions": total_deletions,
+    }
+    total_files = len(files)
+    status_scope = ""
+    if pr:
+        total_files = pr.get("changed_files") or total_files
+        file_stats["total_additions"] = pr.get("additions", total_additions)
+        file_stats["total_deletions"] = pr.get("deletions", total_deletions)
+        if total_files > len(files):
+            status_scope = f" (of the {len(files)} files listed)"
+
+    prompt = _REVIEW_PROMPT.format(files="\n".join(summary_lines))
 
     # Use runner if available
     if runner is not None and run_agent is not None:
@@ -86,129 +314,143 @@ async def generate_pr_review_comment(
             if res and res.strip() and not res.startswith("You are an expert"):
                 return res
         except Exception as e:
-            print(f"[Review] LLM generation failed: {e}, using fallback")
+            log.warning("[Review] LLM generation failed: %s, using fallback", e)
 
     # Fallback heuristic comment (better than before)
-    comment = "### 🤖 Patcher Automated Review\n\n"
-    comment += f"**Summary of Changes:**\n"
-    comment += f"- Files changed: {len(files)}\n"
-    comment += f"- Files added: {file_stats['added']}\n"
-    comment += f"- Files modified: {file_stats['modified']}\n"
-    comment += f"- Files deleted: {file_stats['deleted']}\n"
-    comment += f"- Total additions: +{file_stats['total_additions']}\n"
-    comment += f"- Total deletions: -{file_stats['total_deletions']}\n\n"
-    
-    comment += "**Files Changed:**\n"
-    for line in summary_lines[:max_files]:
-        first_line = line.split("\n")[0]  # Get just the filename line
-        comment += f"- {first_line}\n"
-    
-    comment += "\n**Review Checklist:**\n"
-    comment += "- [ ] Code follows project style guidelines\n"
-    comment += "- [ ] Changes are well-documented\n"
-    comment += "- [ ] Tests cover new functionality\n"
-    comment += "- [ ] No breaking changes introduced\n\n"
-    
-    comment += "---\n*This is an automated review. Please review the actual changes and test thoroughly before merging.*"
-    return comment
+    parts = [
+        "### 🤖 Patcher Automated Review\n",
+        "**Summary of Changes:**",
+        f"- Files changed: {total_files}",
+        f"- Files added: {file_stats['added']}{status_scope}",
+        f"- Files modified: {file_stats['modified']}{status_scope}",
+        f"- Files deleted: {file_stats['deleted']}{status_scope}",
+        f"- Total additions: +{file_stats['total_additions']}",
+        f"- Total deletions: -{file_stats['total_deletions']}\n",
+        "**Files Changed:**",
+    ]
+    # Just the filename line of each summary entry
+    parts.extend("- " + line.partition("\n")[0] for line in summary_lines[:max_files])
+    parts.append(_REVIEW_FOOTER)
+    return "\n".join(parts)
 
-def create_pull_request(repo_url: str, new_branch: str, base_branch: str, gh_token: str, title: str, body: str) -> str:
-    # repo_url: https://github.com/owner/repo.git
-    clean = repo_url.rstrip("/").replace(".git", "")
-    owner_repo = clean.split("github.com/")[-1]
-    api_url = f"https://api.github.com/repos/{owner_repo}/pulls"
 
-    headers = {
-        "Authorization": f"token {gh_token}",
-        "Accept": "application/vnd.github+json",
-    }
-    payload = {
+def _cached_get(url: str, headers, params: Optional[dict] = None) -> tuple[int, Any]:
+    """GET url and return (status, parsed JSON body or None), revalidating cached bodies by ETag."""
+    key = (url, tuple(sorted((params or {}).items())))
+    now = time.monotonic()
+    with _get_cache_lock:
+        cached = _get_cache.get(key)
+        if cached and now - cached[0] > _GET_CACHE_TTL:
+            del _get_cache[key]
+            cached = None
+    if cached:
+        headers = {**headers, "If-None-Match": cached[1]}
+    resp = _session.get(url, headers=headers, params=params, timeout=15)
+    if resp.status_code == 304 and cached:
+        return 200, cached[2]
+    if resp.status_code != 200:
+        return resp.status_code, None
+    data = loads(resp.content)
+    etag = resp.headers.get("ETag")
+    if etag:
+        with _get_cache_lock:
+            _get_cache[key] = (now, etag, data)
+            _get_cache.move_to_end(key)
+            while len(_get_cache) > _GET_CACHE_MAX:
+                _get_cache.popitem(last=False)
+    return 200, data
+
+
+def _list_prs_for_head(api_url: str, headers, head: str) -> list:
+    """List PRs (any state) for `head`."""
+    _, prs = _cached_get(api_url, headers, {"head": head, "state": "all"})
+    return prs or []
+
+
+def _pr_payload(new_branch: str, base_branch: str, title: str, body: str) -> dict:
+    return {
         "title": title,
         "head": new_branch,
         "base": base_branch,
         "body": body,
     }
-    # First, check if a PR already exists for this head branch to avoid duplicates
-    try:
-        list_resp = requests.get(api_url, headers=headers, params={"head": f"{owner_repo.split('/')[0]}:{new_branch}", "state": "all"})
-        if list_resp.status_code == 200:
-            prs = list_resp.json()
+
+
+def create_pr_new_branch(repo_url: str, new_branch: str, base_branch: str, gh_token: str, title: str, body: str) -> str:
+    """Open a PR for a branch that was just created (e.g. timestamped), so cannot have one yet.
+
+    A single POST; unlike `create_pull_request` it never looks for an existing PR.
+    """
+    ref = _parse_repo_url(repo_url)
+    api_url = f"{ref.api_base}/pulls"
+    resp = _post_json(api_url, gh_token, _pr_payload(new_branch, base_branch, title, body))
+    resp.raise_for_status()
+    return loads(resp.content).get("html_url", "")
+
+
+def create_pull_request(repo_url: str, new_branch: str, base_branch: str, gh_token: str, title: str, body: str,
+                        check_existing: bool = False) -> str:
+    """Open a PR for new_branch, or return the URL of an existing PR for it.
+
+    Existing PRs are only listed when GitHub rejects the create (422). Pass
+    check_existing=True when a PR for new_branch is likely, to list them while the
+    create is in flight instead of after it.
+    """
+    # repo_url: https://github.com/owner/repo.git
+    ref = _parse_repo_url(repo_url)
+    api_url = f"{ref.api_base}/pulls"
+    headers = _gh_headers(gh_token)
+    head = f"{ref.owner}:{new_branch}"
+    list_fut = _prefetch.submit(_list_prs_for_head, api_url, headers, head) if check_existing else None
+    resp = _post_json(api_url, gh_token, _pr_payload(new_branch, base_branch, title, body))
+    if resp.status_code == 422:
+        log.info("[Publisher] PR create rejected (422), looking for an existing PR for %s", head)
+        try:
+            prs = list_fut.result() if list_fut else _list_prs_for_head(api_url, headers, head)
             if prs:
-                # Return the first matching PR URL
                 pr = prs[0]
-                print(f"[Publisher] Found existing PR: {pr.get('html_url')}")
+                log.info("[Publisher] Found existing PR: %s", pr.get("html_url"))
                 return pr.get("html_url", "")
-    except Exception:
-        # ignore list errors and proceed to create
-        pass
+        except Exception:
+            pass
+    resp.raise_for_status()
 
-    resp = requests.post(api_url, headers=headers, json=payload)
-    try:
-        resp.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        # If GitHub returns 422 Unprocessable Entity, try to find an existing PR and return it
-        if resp.status_code == 422:
-            try:
-                list_resp = requests.get(api_url, headers=headers, params={"head": f"{owner_repo.split('/')[0]}:{new_branch}", "state": "all"})
-                if list_resp.status_code == 200:
-                    prs = list_resp.json()
-                    if prs:
-                        pr = prs[0]
-                        print(f"[Publisher] Existing PR found after 422: {pr.get('html_url')}")
-                        return pr.get("html_url", "")
-            except Exception:
-                pass
-        raise
-
-    pr = resp.json()
+    pr = loads(resp.content)
     return pr.get("html_url", "")
 
 
 def create_issue(repo_url: str, title: str, body: str, gh_token: str) -> str:
-    clean = repo_url.rstrip("/").replace(".git", "")
-    owner_repo = clean.split("github.com/")[-1]
-    api_url = f"https://api.github.com/repos/{owner_repo}/issues"
-
-    headers = {
-        "Authorization": f"token {gh_token}",
-        "Accept": "application/vnd.github+json",
-    }
+    api_url = f"{_parse_repo_url(repo_url).api_base}/issues"
     payload = {"title": title, "body": body}
-    resp = requests.post(api_url, headers=headers, json=payload)
+    resp = _post_json(api_url, gh_token, payload)
     resp.raise_for_status()
-    issue = resp.json()
+    issue = loads(resp.content)
     return issue.get("html_url", "")
 
 
 def post_pr_comment(pr_url: str, comment: str, gh_token: str) -> str:
     # pr_url: https://github.com/owner/repo/pull/123
-    parts = pr_url.rstrip("/").split("/")
-    if len(parts) < 2:
-        raise ValueError("Invalid PR URL")
-    pr_number = parts[-1]
-    owner_repo = "/".join(parts[-4:-2])
-    api_url = f"https://api.github.com/repos/{owner_repo}/issues/{pr_number}/comments"
-    headers = {"Authorization": f"token {gh_token}", "Accept": "application/vnd.github+json"}
+    ref, pr_number = _parse_pr_url(pr_url)
+    api_url = f"{ref.api_base}/issues/{pr_number}/comments"
     payload = {"body": comment}
     
-    print(f"[Patcher Review] Posting comment to {owner_repo}#{pr_number}...")
+    log.info("[Patcher Review] Posting comment to %s#%s...", ref.owner_repo, pr_number)
     
-    try:
-        resp = requests.post(api_url, headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-        print(f"[Patcher Review] ✅ Comment posted successfully")
+    resp = _post_json(api_url, gh_token, payload)
+    status = resp.status_code
+    if status < 400:
+        data = loads(resp.content)
+        log.info("[Patcher Review] ✅ Comment posted successfully")
         return data.get("html_url", "")
-    except requests.exceptions.HTTPError as e:
-        error_status = e.response.status_code
-        if error_status == 403:
-            raise PermissionError(
-                f"403 Forbidden: Your token doesn't have write access to this repository. "
-                f"You need a token with 'issues:write' and 'pull_requests:write' scope from the repo owner or a user with push access."
-            )
-        elif error_status == 404:
-            raise ValueError(f"404 Not Found: PR #{pr_number} not found in {owner_repo}")
-        elif error_status == 401:
-            raise PermissionError("401 Unauthorized: Invalid or expired GitHub token")
-        else:
-            raise Exception(f"GitHub API error {error_status}: {e.response.text}")
+    if status == 403:
+        raise PermissionError(
+            f"403 Forbidden: Your token doesn't have write access to this repository. "
+            f"You need a token with 'issues:write' and 'pull_requests:write' scope from the repo owner or a user with push access."
+        )
+    elif status == 404:
+        raise ValueError(f"404 Not Found: PR #{pr_number} not found in {ref.owner_repo}")
+    elif status == 401:
+        raise PermissionError("401 Unauthorized: Invalid or expired GitHub token")
+    else:
+        # GitHub's error bodies carry the useful part up front; don't embed a huge one
+        raise Exception(f"GitHub API error {status}: {resp.content[:512].decode('utf-8', 'replace')}")
@@ -1,10 +0,0 @@
-"""Semantic refactor agent placeholder.
-
-Provides a minimal function that could be expanded to run deeper LLM-driven refactors.
-"""
-from typing import Optional
-
-
-def run_semantic_refactor(local_path: str, runner=None) -> str:
-    # Placeholder: in real implementation, call LLM to analyze and suggest refactors
-    return "No semantic refactors performed."
@@ -1,12 +1,16 @@
 import asyncio
 import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import io
 import os
 import queue
 import re
+import tempfile
 import threading
 import time
 import warnings
+from collections import Counter, deque
 
 # Suppress noisy Pydantic schema warning about the built-in `any` function
 warnings.filterwarnings(
@@ -20,6 +24,8 @@ import plotly.graph_objects as go
 
 from agents.orchestrator import run_pipeline
 from core.artifacts import get_artifact
+from core.git_utils import get_commit_history
+from core.logging_utils import capture_stdout
 
 
 st.set_page_config(page_title="Patcher - AutoPatch PR Agent", layout="wide")
@@ -33,6 +39,17 @@ if 'pr_pending' not in st.session_state:
 st.title("🤖 Patcher - AutoPatch Agent")
 st.write("AI-powered bot to auto-fix code style issues, create PRs, and optionally review them. Built by Patcher.")
 
+# owner/repo out of https://github.com/owner/repo(.git) or git@github.com:owner/repo(.git)
+_REPO_RE = re.compile(r"github\.com[/:]([^/\s]+)/([^/\s]+?)(?:\.git)?/?$", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=64)
+def parse_owner_repo(url: str) -> tuple[str, str] | None:
+    """Return (owner, repo) for a GitHub repository URL, or None if it isn't one."""
+    m = _REPO_RE.search(url.strip())
+    return (m.group(1), m.group(2)) if m else None
+
+
 # Sidebar for inputs
 with st.sidebar:
     st.header("Configuration")
@@ -44,7 +61,7 @@ with st.sidebar:
             return False, "Repository URL is required"
         if "github.com" not in url.lower():
             return False, "Must be a GitHub repository URL"
-        if not (".git" in url or "/" in url.split("github.com")[-1]):
+        if parse_owner_repo(url) is None:
             return False, "Invalid GitHub URL format"
         return True, "Valid GitHub URL"
     
@@ -157,12 +174,106 @@ with st.sidebar:
 
 
 
-def _run_pipeline_background(
+# Pipeline stages shown in the UI, and the status each event suffix puts a stage in
+PIPELINE_STAGES = (
+    "clone", "scan", "lint", "analyze", "security", "semantic", "confidence", "generate",
+    "fix", "apply", "commit", "push", "publish", "pr", "prreview", "ci",
+)
+_SUFFIX_STATUS = {"start": "running", "done": "success", "error": "error", "conflict": "error", "pending": "pending"}
+# "<stage>:<suffix>" -> (stage, status), so each progress event is one dict lookup
+EVENT_TABLE = {
+    f"{stage}:{suffix}": (stage, status)
+    for stage in PIPELINE_STAGES
+    for suffix, status in _SUFFIX_STATUS.items()
+}
+# Stage box labels for every (stage, status) pair, built once rather than on each redraw
+_STAGE_EMOJIS = {
+    "clone": "📦", "scan": "🔍", "lint": "✨", "analyze": "📊",
+    "security": "🔒", "semantic": "🧠", "confidence": "📈",
+    "generate": "💡", "fix": "🔧", "apply": "✅", "commit": "📝",
+    "push": "⬆️", "publish": "🚀", "pr": "🔀", "prreview": "👀", "ci": "⚙️"
+}
+_STATUS_ICONS = {"success": "✅", "pending": "⏳", "running": "🔄", "error": "❌"}
+# 2-bit code per status for status_fingerprint()
+_STATUS_BITS = {"pending": 0, "running": 1, "success": 2, "error": 3}
+# Chart colours
+_PIE_COLORS = {"success": "#00CC96", "pending": "#AB63FA", "running": "#FFA15A", "error": "#FF6692"}
+_SEVERITY_COLORS = {"HIGH": "#FF6692", "MEDIUM": "#FFA15A", "LOW": "#00CC96"}
+
+
+def _stage_text(stage: str, status: str) -> str:
+    return f"{_STAGE_EMOJIS.get(stage, '')} {stage.title()}\n{_STATUS_ICONS.get(status, '')} {status.upper()}"
+
+
+STAGE_TEXT = {(stage, status): _stage_text(stage, status) for stage in PIPELINE_STAGES for status in _STATUS_ICONS}
+
+# Log panel: redraw at most every LOG_FLUSH_INTERVAL s unless LOG_FLUSH_BYTES arrived, and show
+# only the last LOG_TAIL_LINES lines; the full log goes to a file offered for download afterwards
+LOG_FLUSH_INTERVAL = 0.5
+LOG_FLUSH_BYTES = 4096
+LOG_TAIL_LINES = 400
+# Log items the worker -> UI queue holds before it starts dropping the oldest ones
+OUT_QUEUE_MAX_LOGS = 2048
+# Output without a newline is held back until this much has accumulated
+LOG_BATCH_CHARS = 1024
+
+
+class _OutputQueue(queue.Queue):
+    """Worker -> UI queue whose puts never block.
+
+    Events and the final None are always kept. Past max_logs queued ("log", text) items,
+    the oldest queued log item is dropped to make room and counted in `dropped_logs`.
+    """
+
+    def __init__(self, max_logs: int):
+        super().__init__()
+        self.max_logs = max_logs
+        self.queued_logs = 0
+        self.dropped_logs = 0
+
+    # _put/_get run under the queue's own mutex
+    def _put(self, item):
+        if item is not None and item[0] == "log":
+            if self.queued_logs >= self.max_logs:
+                for i, queued in enumerate(self.queue):
+                    if queued is not None and queued[0] == "log":
+                        del self.queue[i]
+                        break
+                self.dropped_logs += 1
+            else:
+                self.queued_logs += 1
+        self.queue.append(item)
+
+    def _get(self):
+        item = self.queue.popleft()
+        if item is not None and item[0] == "log":
+            self.queued_logs -= 1
+        return item
+
+
+# Builds the charts that changed in a UI tick side by side, so the bars' artifact reads overlap
+_CHART_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="chart-build")
+
+
+@st.cache_resource
+def _pipeline_loop() -> asyncio.AbstractEventLoop:
+    """One event loop per server process, kept running on a daemon thread across reruns."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+    return loop
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _commit_history(repo_path: str, max_count: int = 50) -> list:
+    """get_commit_history, reused across reruns for a minute; call _commit_history.clear() after a push."""
+    return get_commit_history(repo_path, max_count)
+
+
+async def _run_pipeline_background(
     repo,
     token,
     base,
-    log_queue,
-    event_queue,
+    out_queue,
     security_flag=False,
     pr_review_flag=False,
     ci_flag=False,
@@ -170,119 +281,198 @@ def _run_pipeline_background(
     semantic_flag=False,
     auto_pr_flag=False,
     pr_requirement=None,
+    log_path=None,
 ):
-    """Run the async pipeline in a thread and push logs/events to queues."""
+    """Run the async pipeline on the shared loop and push logs/events to one queue.
+
+    Items are ("log", text) or ("event", (stage, info)); a final None marks the end.
+    Producers run on the shared loop, so they never wait on the UI: out_queue should be an
+    _OutputQueue, which drops the oldest log items once a stalled page falls behind.
+    If log_path is given, the complete output is also appended to that file.
+    """
+    def offer(item):
+        out_queue.put_nowait(item)
+
     def progress_cb(stage, info=None):
-        event_queue.put((stage, info))
+        offer(("event", (stage, info)))
+
+    log_file = open(log_path, "a", encoding="utf-8") if log_path else None
+    # Written from both the loop thread (print) and the logging listener thread
+    log_file_lock = threading.Lock()
 
     class QueueWriter:
-        def __init__(self, q):
-            self.q = q
+        """Queues whole lines: print() writes the text and its newline separately."""
+
+        def __init__(self):
+            self.buf = []
+            self.buf_len = 0
 
         def write(self, data):
-            if data:
-                self.q.put(data)
+            if not data:
+                return
+            with log_file_lock:
+                if log_file is not None:
+                    log_file.write(data)
+                self.buf.append(data)
+                self.buf_len += len(data)
+                if "\n" not in data and self.buf_len < LOG_BATCH_CHARS:
+                    return
+                text = self._take()
+            offer(("log", text))
 
         def flush(self):
-            pass
-
-    qw = QueueWriter(log_queue)
+            with log_file_lock:
+                text = self._take()
+            if text:
+                offer(("log", text))
+
+        def _take(self):
+            text = "".join(self.buf)
+            self.buf.clear()
+            self.buf_len = 0
+            return text
+
+    qw = QueueWriter()
     try:
-        # Redirect stdout to queue while running
-        with contextlib.redirect_stdout(qw):
-            asyncio.run(
-                run_pipeline(
-                    repo,
-                    token,
-                    base,
-                    progress_callback=progress_cb,
-                    security_lint=security_flag,
-                    pr_review_comments=pr_review_flag,
-                    ci_integration=ci_flag,
-                    confidence_scoring=confidence_flag,
-                    semantic_refactor=semantic_flag,
-                    auto_create_pr=auto_pr_flag,
-                    pr_requirement=pr_requirement,
-                )
+        # Route this run's output (prints, logs, its worker threads) to the queue; sys.stdout
+        # itself is shared by every run on the loop, so it is not swapped
+        with capture_stdout(qw):
+            await run_pipeline(
+                repo,
+                token,
+                base,
+                progress_callback=progress_cb,
+                security_lint=security_flag,
+                pr_review_comments=pr_review_flag,
+                ci_integration=ci_flag,
+                confidence_scoring=confidence_flag,
+                semantic_refactor=semantic_flag,
+                auto_create_pr=auto_pr_flag,
+                pr_requirement=pr_requirement,
             )
     except Exception as e:
-        log_queue.put(f"ERROR: {e}\n")
-        event_queue.put(("error", str(e)))
+        qw.write(f"ERROR: {e}\n")
+        offer(("event", ("error", str(e))))
+    finally:
+        qw.flush()
+        with log_file_lock:
+            if log_file is not None:
+                log_file.close()
+                log_file = None
+        offer(None)
+
+
+def _log_view(tail, partial: str) -> str:
+    """Text for the log panel: the kept tail lines plus the line still being written."""
+    text = "\n".join(tail)
+    if partial:
+        text = f"{text}\n{partial}" if text else partial
+    return text
+
+
+def status_fingerprint(stage_statuses: dict) -> int:
+    """Pack the stage statuses into one int, two bits per stage in PIPELINE_STAGES order."""
+    fp = 0
+    for i, stage in enumerate(PIPELINE_STAGES):
+        fp |= _STATUS_BITS.get(stage_statuses.get(stage), 0) << (2 * i)
+    return fp
+
+
+def status_counts_key(stage_statuses: dict) -> tuple:
+    """Hashable ((status, count), ...) summary of the stage statuses."""
+    return tuple(sorted(Counter(stage_statuses.values()).items()))
+
+
+@functools.lru_cache(maxsize=64)
+def _build_pie_fig(status_counts: tuple):
+    """Build the status pie for a status_counts_key() tuple; callers must not mutate the result."""
+    labels = [status for status, _ in status_counts]
+    values = [count for _, count in status_counts]
+    color_list = [_PIE_COLORS.get(l, "#636EFA") for l in labels]
+    
+    # Layout goes into the constructor: a separate update_layout() validates everything a second time
+    return go.Figure(
+        data=[go.Pie(labels=labels, values=values, marker=dict(colors=color_list))],
+        layout=dict(title="Pipeline Stage Status Distribution", height=400),
+    )
 
 
 def create_stage_status_pie(stage_statuses: dict):
     """Create a pie chart showing stage status distribution."""
-    status_counts = {}
-    for s, status in stage_statuses.items():
-        if status not in status_counts:
-            status_counts[status] = 0
-        status_counts[status] += 1
-    
-    labels = list(status_counts.keys())
-    values = list(status_counts.values())
-    colors = {
-        "success": "#00CC96",
-        "pending": "#AB63FA",
-        "running": "#FFA15A",
-        "error": "#FF6692"
-    }
-    color_list = [colors.get(l, "#636EFA") for l in labels]
-    
-    fig = go.Figure(data=[go.Pie(labels=labels, values=values, marker=dict(colors=color_list))])
-    fig.update_layout(title="Pipeline Stage Status Distribution", height=400)
-    return fig
+    return _build_pie_fig(status_counts_key(stage_statuses))
 
 
-def create_issues_bar(report_id: str):
+def create_issues_bar(report_id: str, artifact: dict | None = None):
     """Create a bar chart showing issue types/counts if available."""
-    artifact = get_artifact(report_id)
+    if artifact is None:
+        artifact = get_artifact(report_id)
     if not artifact or not artifact.get("issues"):
         return None
     
     issues = artifact.get("issues", [])
     # Group by issue type/code if available
-    issue_types = {}
-    for issue in issues:
-        itype = issue.get("code") or issue.get("rule") or "other"
-        issue_types[itype] = issue_types.get(itype, 0) + 1
-    
-    if not issue_types:
-        return None
-    
-    types = list(issue_types.keys())
-    counts = list(issue_types.values())
+    issue_types = Counter(i.get("code") or i.get("rule") or "other" for i in issues)
+    types, counts = zip(*issue_types.items())
     
-    fig = go.Figure(data=[go.Bar(x=types, y=counts, marker=dict(color='#00CC96'))])
-    fig.update_layout(title=f"Issues by Type (Total: {len(issues)})", xaxis_title="Issue Type", yaxis_title="Count", height=400)
-    return fig
+    return go.Figure(
+        data=[go.Bar(x=types, y=counts, marker=dict(color='#00CC96'))],
+        layout=dict(title=f"Issues by Type (Total: {len(issues)})", xaxis_title="Issue Type", yaxis_title="Count", height=400),
+    )
 
 
-def create_security_issues_bar(bandit_report_id: str):
+def create_security_issues_bar(bandit_report_id: str, artifact: dict | None = None):
     """Create a bar chart for security issues if Bandit report exists."""
     if not bandit_report_id:
         return None
-    artifact = get_artifact(bandit_report_id)
+    if artifact is None:
+        artifact = get_artifact(bandit_report_id)
     if not artifact or not artifact.get("issues"):
         return None
     
     issues = artifact.get("issues", [])
-    severity_types = {}
-    for issue in issues:
-        sev = issue.get("severity") or issue.get("level") or "unknown"
-        severity_types[sev] = severity_types.get(sev, 0) + 1
+    severity_types = Counter(i.get("severity") or i.get("level") or "unknown" for i in issues)
+    sevs, counts = zip(*severity_types.items())
     
-    if not severity_types:
-        return None
-    
-    sevs = list(severity_types.keys())
-    counts = list(severity_types.values())
-    
-    color_map = {"HIGH": "#FF6692", "MEDIUM": "#FFA15A", "LOW": "#00CC96"}
-    colors = [color_map.get(s, "#636EFA") for s in sevs]
+    colors = [_SEVERITY_COLORS.get(s, "#636EFA") for s in sevs]
     
-    fig = go.Figure(data=[go.Bar(x=sevs, y=counts, marker=dict(color=colors))])
-    fig.update_layout(title=f"Security Issues by Severity (Total: {len(issues)})", xaxis_title="Severity", yaxis_title="Count", height=400)
-    return fig
+    return go.Figure(
+        data=[go.Bar(x=sevs, y=counts, marker=dict(color=colors))],
+        layout=dict(title=f"Security Issues by Severity (Total: {len(issues)})", xaxis_title="Severity", yaxis_title="Count", height=400),
+    )
+
+
+_REVIEW_FALLBACK = (
+    "Automated review by Patcher: Could not generate detailed AI review.\n"
+    "Please inspect PR #{pr_number} at {pr_url}."
+)
+
+
+async def _review_and_post(pr_url, pr_number, repo_url, token):
+    """Generate a review for the PR and post it as a comment."""
+    from agents.publish_agent import generate_pr_review_comment, post_pr_comment
+
+    # Generate a dynamic AI-based review comment (falls back to heuristic if LLM not available)
+    try:
+        comment_body = await generate_pr_review_comment(None, "ui-session", pr_url, repo_url, token)
+    except Exception:
+        # Fallback to brief heuristic if the async generator fails
+        comment_body = _REVIEW_FALLBACK.format(pr_number=pr_number, pr_url=pr_url)
+    await asyncio.to_thread(post_pr_comment, pr_url, comment_body, token)
+
+
+@st.fragment(run_every=1.0)
+def _review_progress():
+    """Poll the running review; once it finishes, hand its outcome to a full rerun."""
+    job = st.session_state.get('review_job')
+    if not job:
+        return
+    pr_number, pr_url, fut = job
+    if not fut.done():
+        st.info(f"🔄 Patcher is reviewing PR #{pr_number}...")
+        return
+    del st.session_state['review_job']
+    st.session_state['review_result'] = (pr_number, pr_url, fut.exception())
+    st.rerun()
 
 
 if run_now:
@@ -297,25 +487,20 @@ if run_now:
         if not is_valid:
             st.error(f"❌ Invalid repository URL: {validation_msg}")
         else:
-            log_q: "queue.Queue[str]" = queue.Queue()
-            event_q: "queue.Queue[tuple]" = queue.Queue()
-
-            # Stage definitions with emojis
-            stage_emojis = {
-                "clone": "📦", "scan": "🔍", "lint": "✨", "analyze": "📊",
-                "security": "🔒", "semantic": "🧠", "confidence": "📈",
-                "generate": "💡", "fix": "🔧", "apply": "✅", "commit": "📝",
-                "push": "⬆️", "publish": "🚀", "pr": "🔀", "prreview": "👀", "ci": "⚙️"
-            }
+            # ("log", text) and ("event", (stage, info)) items, then None once the run ends
+            out_q = _OutputQueue(OUT_QUEUE_MAX_LOGS)
+
+            # Full log for the download button; the previous run's file is no longer needed
+            old_log = st.session_state.pop('log_path', None)
+            if old_log:
+                with contextlib.suppress(OSError):
+                    os.remove(old_log)
+            fd, log_path = tempfile.mkstemp(prefix="autopatch-run-", suffix=".log")
+            os.close(fd)
+            st.session_state['log_path'] = log_path
 
             # Initialize stage status tracking
-            stage_statuses = {
-                "clone": "pending", "scan": "pending", "lint": "pending", "analyze": "pending",
-                "security": "pending", "semantic": "pending", "confidence": "pending",
-                "generate": "pending", "fix": "pending", "apply": "pending",
-                "commit": "pending", "push": "pending", "publish": "pending",
-                "pr": "pending", "prreview": "pending", "ci": "pending"
-                }
+            stage_statuses = dict.fromkeys(PIPELINE_STAGES, "pending")
 
             # Create layout: main area + right sidebar
             col1, col2 = st.columns([2, 1])
@@ -331,14 +516,19 @@ if run_now:
                 # Stage boxes grid
                 stage_grid = st.columns(4)
                 stage_boxes = {}
-                for idx, (stage_name, emoji) in enumerate(stage_emojis.items()):
+                for idx, stage_name in enumerate(PIPELINE_STAGES):
                     col = stage_grid[idx % 4]
                     stage_boxes[stage_name] = col.empty()
 
                 # Logs section
                 st.subheader("📋 Execution Logs")
                 log_container = st.empty()
-                log_text = ""
+                log_tail: "deque[str]" = deque(maxlen=LOG_TAIL_LINES)
+                log_partial = ""
+                pending_log_chars = 0
+                last_log_flush = 0.0
+                # Log items the queue has dropped so far, and how many the panel has noted
+                shown_dropped = 0
 
                 # Issue visualizations
                 issues_col1, issues_col2 = st.columns(2)
@@ -351,16 +541,32 @@ if run_now:
 
                 report_id = None
                 bandit_report_id = None
-
-            # Start background thread
-            t = threading.Thread(
-                target=_run_pipeline_background,
-                args=(
+                # What each chart last rendered, so unchanged charts are not re-sent
+                last_pie_key = None
+                shown_statuses = dict.fromkeys(PIPELINE_STAGES)
+                last_statuses_fp = None
+                last_issues_id = None
+                last_security_id = None
+                last_summary_ids = None
+
+                # Artifacts are stored once under a fresh ID and never rewritten, so one fetch per ID will do
+                artifacts = {}
+
+                def artifact_for(rid):
+                    art = artifacts.get(rid)
+                    if art is None:
+                        art = get_artifact(rid)
+                        if art is not None:
+                            artifacts[rid] = art
+                    return art
+
+            # Schedule the run on the long-lived pipeline loop
+            job = asyncio.run_coroutine_threadsafe(
+                _run_pipeline_background(
                     repo_url.strip(),
                     gh_token.strip(),
                     base_branch.strip() or None,
-                    log_q,
-                    event_q,
+                    out_q,
                     enable_security,
                     enable_pr_review,
                     enable_ci,
@@ -368,23 +574,62 @@ if run_now:
                     enable_semantic,
                     True,  # Always auto-create PR
                     pr_requirement if pr_requirement else None,  # Pass PR requirement if provided
+                    log_path=log_path,
                 ),
-                daemon=True,
+                _pipeline_loop(),
             )
-            t.start()
 
             with st.spinner("🔄 Running agents — streaming logs below..."):
-                while t.is_alive() or not log_q.empty() or not event_q.empty():
+                finished = False
+                while not finished:
+                    # Drops counted by now were of items older than anything still queued
+                    dropped = out_q.dropped_logs
+                    # Sleep until the worker produces something, then take everything queued
+                    try:
+                        batch = [out_q.get(timeout=0.5)]
+                    except queue.Empty:
+                        if job.done():
+                            break
+                        if pending_log_chars:
+                            # Quiet spell: show output held back by the throttle
+                            log_container.code(_log_view(log_tail, log_partial), language="log")
+                            pending_log_chars = 0
+                            last_log_flush = time.monotonic()
+                        continue
                     try:
-                        # Process events
-                        while not event_q.empty():
-                            stage, info = event_q.get_nowait()
-
-                            if stage == "clone:start":
-                                stage_statuses["clone"] = "running"
-                            elif stage == "clone:done":
-                                stage_statuses["clone"] = "success"
-                            elif stage == "requirement:start":
+                        while True:
+                            batch.append(out_q.get_nowait())
+                    except queue.Empty:
+                        pass
+
+                    try:
+                        if dropped != shown_dropped:
+                            # The page fell behind; the downloadable log file still has everything
+                            log_tail.append(f"{log_partial}…[{dropped - shown_dropped} log chunks skipped]…")
+                            log_partial = ""
+                            shown_dropped = dropped
+                        events = []
+                        for item in batch:
+                            if item is None:
+                                # Worker is done; nothing follows its sentinel
+                                finished = True
+                            elif item[0] == "event":
+                                events.append(item[1])
+                            else:
+                                chunk = str(item[1])
+                                pending_log_chars += len(chunk)
+                                # Complete lines go to the bounded tail; the unfinished one waits
+                                lines = (log_partial + chunk).split("\n")
+                                log_partial = lines.pop()
+                                log_tail.extend(lines)
+
+                        for stage, info in events:
+                            hit = EVENT_TABLE.get(stage)
+                            if hit:
+                                stage_statuses[hit[0]] = hit[1]
+
+                            # Events that carry data or touch more than one stage
+                            if stage == "requirement:start":
                                 # When requirement-driven, map requirement stage to scan/lint
                                 stage_statuses["scan"] = "running"
                                 stage_statuses["lint"] = "running"
@@ -392,108 +637,15 @@ if run_now:
                                 stage_statuses["scan"] = "success"
                                 stage_statuses["lint"] = "success"
                                 st.session_state['pr_requirement'] = info
-                            elif stage == "scan:start":
-                                stage_statuses["scan"] = "running"
-                            elif stage == "scan:done":
-                                stage_statuses["scan"] = "success"
-                            elif stage == "lint:start":
-                                stage_statuses["lint"] = "running"
-                            elif stage == "lint:done":
-                                stage_statuses["lint"] = "success"
-                            elif stage == "analyze:start":
-                                stage_statuses["analyze"] = "running"
-                            elif stage == "analyze:done":
-                                stage_statuses["analyze"] = "success"
-                                # Extract report ID from info
-                                match = re.search(r"Reference ID: ([a-f0-9\-]{36})", str(info))
-                                if match:
-                                    report_id = match.group(1)
-                            elif stage == "security:start":
-                                stage_statuses["security"] = "running"
+                            elif stage == "analyze:report":
+                                report_id = info
                             elif stage == "security:done":
-                                stage_statuses["security"] = "success"
                                 bandit_report_id = info
-                            elif stage == "security:error":
-                                stage_statuses["security"] = "error"
-                            elif stage == "semantic:start":
-                                stage_statuses["semantic"] = "running"
-                            elif stage == "semantic:done":
-                                stage_statuses["semantic"] = "success"
-                            elif stage == "confidence:start":
-                                stage_statuses["confidence"] = "running"
-                            elif stage == "confidence:done":
-                                stage_statuses["confidence"] = "success"
-                            elif stage == "generate:start":
-                                stage_statuses["generate"] = "running"
-                            elif stage == "generate:done":
-                                stage_statuses["generate"] = "success"
-                            elif stage == "fix:start":
-                                stage_statuses["fix"] = "running"
-                            elif stage == "fix:done":
-                                stage_statuses["fix"] = "success"
-                            elif stage == "fix:error":
-                                stage_statuses["fix"] = "error"
-                            elif stage == "apply:done":
-                                stage_statuses["apply"] = "success"
-                            elif stage == "commit:start":
-                                stage_statuses["commit"] = "running"
-                            elif stage == "commit:done":
-                                stage_statuses["commit"] = "success"
-                            elif stage == "commit:error":
-                                stage_statuses["commit"] = "error"
-                            elif stage == "push:start":
-                                stage_statuses["push"] = "running"
-                            elif stage == "push:done":
-                                stage_statuses["push"] = "success"
-                            elif stage == "push:conflict":
-                                stage_statuses["push"] = "error"
-                            elif stage == "push:error":
-                                stage_statuses["push"] = "error"
-                            elif stage == "publish:start":
-                                stage_statuses["publish"] = "running"
-                            elif stage == "publish:done":
-                                stage_statuses["publish"] = "success"
-                            elif stage == "publish:error":
-                                stage_statuses["publish"] = "error"
                             elif stage == "pr:created":
                                 stage_statuses["pr"] = "success"
                                 st.session_state['pipeline_result'] = {"pr_url": info}
                             elif stage == "pr:pending":
-                                stage_statuses["pr"] = "pending"
                                 st.session_state['pr_pending'] = True
-                            elif stage == "pr:error":
-                                stage_statuses["pr"] = "error"
-                            elif stage == "prreview:start":
-                                stage_statuses["prreview"] = "running"
-                            elif stage == "prreview:done":
-                                stage_statuses["prreview"] = "success"
-                            elif stage == "prreview:pending":
-                                stage_statuses["prreview"] = "pending"
-                            elif stage == "prreview:error":
-                                stage_statuses["prreview"] = "error"
-                            elif stage == "ci:start":
-                                stage_statuses["ci"] = "running"
-                            elif stage == "ci:done":
-                                stage_statuses["ci"] = "success"
-                            elif stage == "ci:error":
-                                stage_statuses["ci"] = "error"
-                            elif stage == "confidence:start":
-                                stage_statuses["confidence"] = "running"
-                            elif stage == "confidence:done":
-                                stage_statuses["confidence"] = "success"
-                            elif stage == "confidence:error":
-                                stage_statuses["confidence"] = "error"
-                            elif stage == "semantic:start":
-                                stage_statuses["semantic"] = "running"
-                            elif stage == "semantic:done":
-                                stage_statuses["semantic"] = "success"
-                            elif stage == "security:start":
-                                stage_statuses["security"] = "running"
-                            elif stage == "security:done":
-                                stage_statuses["security"] = "success"
-                                bandit_report_id = info
-                            elif stage == "security:error":
-                                stage_statuses["security"] = "error"
                             elif stage == "result":
                                 # Orchestrator returned result dict
                                 try:
@@ -506,81 +658,122 @@ if run_now:
                             elif stage == "error":
                                 st.error(f"❌ Pipeline error: {info}")
 
-                        # Render stage boxes
-                        for stage_name, status in stage_statuses.items():
-                            emoji = stage_emojis.get(stage_name, "")
-                            color_map = {"success": "✅", "pending": "⏳", "running": "🔄", "error": "❌"}
-                            status_icon = color_map.get(status, "")
-                            stage_boxes[stage_name].info(f"{emoji} {stage_name.title()}\n{status_icon} {status.upper()}")
+                        # One integer compare tells whether any stage moved since the last redraw
+                        statuses_fp = status_fingerprint(stage_statuses)
+                        statuses_changed = statuses_fp != last_statuses_fp
+                        last_statuses_fp = statuses_fp
+
+                        # Repaint only the stage boxes whose status changed
+                        if statuses_changed:
+                            for stage_name, status in stage_statuses.items():
+                                if status != shown_statuses[stage_name]:
+                                    text = STAGE_TEXT.get((stage_name, status)) or _stage_text(stage_name, status)
+                                    stage_boxes[stage_name].info(text)
+                                    shown_statuses[stage_name] = status
+
+                        # Start building whichever charts changed; rendering stays on this thread
+                        pie_job = None
+                        if statuses_changed:
+                            pie_key = status_counts_key(stage_statuses)
+                            if pie_key != last_pie_key:
+                                pie_job = _CHART_POOL.submit(_build_pie_fig, pie_key)
+                        # Stored artifacts never change, so one render per report ID is enough. A report
+                        # with no issues has no chart and is just marked done; one not readable yet is retried.
+                        issues_job = security_job = None
+                        if report_id and report_id != last_issues_id:
+                            rid, art = report_id, artifact_for(report_id)
+                            if art and art.get("issues"):
+                                issues_job = _CHART_POOL.submit(create_issues_bar, rid, art)
+                            elif art is not None:
+                                last_issues_id = rid
+                        if bandit_report_id and bandit_report_id != last_security_id:
+                            bid, art = bandit_report_id, artifact_for(bandit_report_id)
+                            if art and art.get("issues"):
+                                security_job = _CHART_POOL.submit(create_security_issues_bar, bid, art)
+                            elif art is not None:
+                                last_security_id = bid
 
                         # Update pie chart
                         try:
-                            fig = create_stage_status_pie(stage_statuses)
-                            status_pie.plotly_chart(fig, use_container_width=True)
+                            if pie_job:
+                                status_pie.plotly_chart(pie_job.result(), use_container_width=True)
+                                last_pie_key = pie_key
                         except Exception:
                             pass
 
                         # Update metrics
                         try:
-                            completed = sum(1 for s in stage_statuses.values() if s == "success")
-                            total = len(stage_statuses)
-                            with metrics_area.container():
-                                col1, col2 = st.columns(2)
-                                col1.metric("Completed", f"{completed}/{total}")
-                                col2.metric("Progress", f"{int(100*completed/total)}%")
+                            if statuses_changed:
+                                completed = sum(1 for s in stage_statuses.values() if s == "success")
+                                total = len(stage_statuses)
+                                with metrics_area.container():
+                                    col1, col2 = st.columns(2)
+                                    col1.metric("Completed", f"{completed}/{total}")
+                                    col2.metric("Progress", f"{int(100*completed/total)}%")
                         except Exception:
                             pass
 
                         # Update issue graphs
                         try:
-                            if report_id:
-                                fig = create_issues_bar(report_id)
+                            if issues_job:
+                                fig = issues_job.result()
                                 if fig:
                                     issues_graph.plotly_chart(fig, use_container_width=True)
+                                last_issues_id = rid
                         except Exception:
                             pass
 
                         try:
-                            if bandit_report_id:
-                                fig = create_security_issues_bar(bandit_report_id)
+                            if security_job:
+                                fig = security_job.result()
                                 if fig:
                                     security_graph.plotly_chart(fig, use_container_width=True)
+                                last_security_id = bid
                         except Exception:
                             pass
 
                         # Update artifact summary
                         try:
-                            artifact_text = ""
-                            if report_id:
-                                art = get_artifact(report_id)
-                                if art:
-                                    artifact_text += f"**Ruff Issues:** {art.get('count', 0)} found\n\n"
-                            if bandit_report_id:
-                                art = get_artifact(bandit_report_id)
-                                if art:
-                                    artifact_text += f"**Security Issues:** {art.get('count', 0)} found\n\n"
-                            if artifact_text:
-                                artifact_container.markdown(artifact_text)
+                            if (report_id, bandit_report_id) != last_summary_ids:
+                                artifact_text = ""
+                                if report_id:
+                                    art = artifact_for(report_id)
+                                    if art:
+                                        artifact_text += f"**Ruff Issues:** {art.get('count', 0)} found\n\n"
+                                if bandit_report_id:
+                                    art = artifact_for(bandit_report_id)
+                                    if art:
+                                        artifact_text += f"**Security Issues:** {art.get('count', 0)} found\n\n"
+                                if artifact_text:
+                                    artifact_container.markdown(artifact_text)
+                                last_summary_ids = (report_id, bandit_report_id)
                         except Exception:
                             pass
 
-                        # Append logs
-                        appended = False
-                        while not log_q.empty():
-                            chunk = log_q.get_nowait()
-                            log_text += str(chunk)
-                            appended = True
-
-                        if appended:
-                            log_container.code(log_text, language="log")
-
-                        time.sleep(0.2)
+                        now = time.monotonic()
+                        if pending_log_chars and (
+                            pending_log_chars >= LOG_FLUSH_BYTES or now - last_log_flush >= LOG_FLUSH_INTERVAL
+                        ):
+                            log_container.code(_log_view(log_tail, log_partial), language="log")
+                            pending_log_chars = 0
+                            last_log_flush = now
 
                     except Exception as e:
                         st.error(f"❌ Error during pipeline: {str(e)}")
 
             st.success("✅ Pipeline completed!")
-            log_container.code(log_text, language="log")
+            log_container.code(_log_view(log_tail, log_partial), language="log")
+            try:
+                with open(log_path, "rb") as f:
+                    st.download_button(
+                        "⬇️ Download full log",
+                        f.read(),
+                        file_name="autopatch-run.log",
+                        mime="text/plain",
+                        on_click="ignore",
+                    )
+            except OSError:
+                pass
 
             # Display configuration used
             st.markdown("---")
@@ -607,7 +800,6 @@ st.markdown("---")
 st.subheader("🔍 PR Auto-Review (Patcher)")
 st.write("Select a PR from the repository for Patcher to automatically review and suggest fixes.")
 
-import pandas as pd
 review_columns = st.columns([2, 1, 1])
 with review_columns[0]:
     pr_number_input = st.number_input("PR Number to Review", min_value=1, value=1, help="Enter the PR number you want Patcher to review")
@@ -619,31 +811,34 @@ with review_columns[2]:
 if review_button:
     if not repo_url or not gh_token:
         st.error("❌ Please configure repo URL and GitHub token first")
+    elif st.session_state.get('review_job'):
+        st.warning("⏳ A review is already in progress.")
+    elif parse_owner_repo(repo_url) is None:
+        st.error("❌ Invalid repository URL: Invalid GitHub URL format")
     else:
-        st.info(f"🔄 Patcher is reviewing PR #{int(pr_number_input)}...")
-        try:
-            from agents.publish_agent import generate_pr_review_comment, post_pr_comment
-            # Extract owner/repo from URL
-            clean_url = repo_url.rstrip("/").replace(".git", "")
-            owner_repo = clean_url.split("github.com/")[-1]
-            pr_url = f"https://github.com/{owner_repo}/pull/{int(pr_number_input)}"
-
-            # Generate a dynamic AI-based review comment (falls back to heuristic if LLM not available)
-            try:
-                comment_body = asyncio.run(generate_pr_review_comment(None, "ui-session", pr_url, repo_url, gh_token.strip()))
-            except Exception:
-                # Fallback to brief heuristic if the async generator fails
-                comment_body = (
-                    f"Automated review by Patcher: Could not generate detailed AI review.\n"
-                    f"Please inspect PR #{int(pr_number_input)} at {pr_url}."
-                )
-
-            post_pr_comment(pr_url, comment_body, gh_token.strip())
-            st.success(f"✅ Patcher has reviewed PR #{int(pr_number_input)} and posted comments!")
-            st.markdown(f"### [View PR with Patcher Comments →]({pr_url})")
-        except PermissionError as e:
-            st.error(f"❌ Access Denied: {str(e)}")
-            st.warning("""
+        owner, repo = parse_owner_repo(repo_url)
+        pr_number = int(pr_number_input)
+        pr_url = f"https://github.com/{owner}/{repo}/pull/{pr_number}"
+        # Generate and post on the pipeline loop so this rerun isn't held up by GitHub or the LLM
+        job = asyncio.run_coroutine_threadsafe(
+            _review_and_post(pr_url, pr_number, repo_url, gh_token.strip()),
+            _pipeline_loop(),
+        )
+        st.session_state['review_job'] = (pr_number, pr_url, job)
+        st.session_state.pop('review_result', None)
+
+if st.session_state.get('review_job'):
+    _review_progress()
+
+review_result = st.session_state.pop('review_result', None)
+if review_result:
+    pr_number, pr_url, e = review_result
+    if e is None:
+        st.success(f"✅ Patcher has reviewed PR #{pr_number} and posted comments!")
+        st.markdown(f"### [View PR with Patcher Comments →]({pr_url})")
+    elif isinstance(e, PermissionError):
+        st.error(f"❌ Access Denied: {str(e)}")
+        st.warning("""
 **How to Fix:**
 1. ✅ **Token Scope Issue**: Your token needs `issues:write` and `pull_requests:write` scope
 2. ✅ **Repository Access**: You or your token must have write access to the repository
@@ -653,13 +848,13 @@ if review_button:
 - Go to GitHub Settings → Developer Settings → Personal Access Tokens
 - Create a new token with at least these scopes: `repo:all`, `issues:write`, `pull_requests:write`
 - Update the token in the configuration above and try again
-            """)
-        except ValueError as e:
-            st.error(f"❌ Invalid Request: {str(e)}")
-            st.info("Make sure the PR number is valid and correctly formatted.")
-        except Exception as e:
-            st.error(f"❌ Review failed: {str(e)}")
-            st.info("Make sure the PR number is valid and your GitHub token has access to the repository.")
+        """)
+    elif isinstance(e, ValueError):
+        st.error(f"❌ Invalid Request: {str(e)}")
+        st.info("Make sure the PR number is valid and correctly formatted.")
+    else:
+        st.error(f"❌ Review failed: {str(e)}")
+        st.info("Make sure the PR number is valid and your GitHub token has access to the repository.")
 
 st.markdown("---")
 st.subheader("📔 Notebook-based Agents (Legacy)")
@@ -1,11 +1,10 @@
 import asyncio
 import re
-import contextlib
 import io
 import queue
 import threading
-import time
 import warnings
+from collections import deque
 
 # Suppress noisy Pydantic schema warning about the built-in `any` function
 warnings.filterwarnings(
@@ -16,9 +15,8 @@ warnings.filterwarnings(
 
 import streamlit as st
 
-from agents.orchestrator import run_pipeline
 from core.artifacts import get_artifact
-from agents.publish_agent import create_pull_request
+from core.logging_utils import capture_stdout
 
 
 st.set_page_config(page_title="AutoPatch PR Agent", layout="centered")
@@ -40,38 +38,102 @@ enable_semantic = st.checkbox("Enable deeper semantic refactoring", value=False)
 
 run_now = st.button("Run AutoPatch")
 
+# Status line each simple progress event writes: event -> (stage placeholder, st method, text)
+STAGE_UPDATES = {
+    "clone:done": ("clone", "success", "Clone: done ({info})"),
+    "scan:start": ("scan", "info", "Scan: running"),
+    "scan:done": ("scan", "success", "Scan: done"),
+    "security:start": ("security", "info", "Security lint: running"),
+    "security:done": ("security", "success", "Security lint: done"),
+    "lint:start": ("lint", "info", "Lint: running"),
+    "lint:done": ("lint", "success", "Lint: done"),
+    "analyze:start": ("analyze", "info", "Analyze: running"),
+    "analyze:done": ("analyze", "success", "Analyze: done"),
+    "semantic:start": ("semantic", "info", "Semantic refactor: running"),
+    "semantic:done": ("semantic", "success", "Semantic refactor: done"),
+    "confidence:start": ("confidence", "info", "Computing patch confidence..."),
+    "confidence:done": ("confidence", "success", "Patch confidence: done"),
+    "generate:start": ("generate", "info", "Generate: running"),
+    "generate:done": ("generate", "success", "Generate: done"),
+    "fix:start": ("fix", "info", "Fix: running"),
+    "fix:done": ("fix", "success", "Fix: done"),
+    "apply:done": ("apply", "success", "Apply: done"),
+    "commit:start": ("commit", "info", "Commit: running"),
+    "commit:done": ("commit", "success", "Commit: done ({info})"),
+    "push:done": ("push", "success", "Push: done ({info})"),
+    "publish:start": ("publish", "info", "Publish: running"),
+    "publish:done": ("publish", "success", "Publish: done"),
+    "pr:created": ("pr", "success", "PR created: {info}"),
+    "prreview:start": ("prreview", "info", "PR review comments: running"),
+    "prreview:done": ("prreview", "success", "PR review comments: done"),
+    "ci:start": ("ci", "info", "CI integration: running"),
+    "ci:done": ("ci", "success", "CI integration: done"),
+}
+
+# Bandit report ID inside the security:done message
+_REF_ID_RE = re.compile(r"Reference ID:\s+([a-f0-9\-]{36})")
+
+# Output without a newline is held back until this much has accumulated
+LOG_BATCH_CHARS = 4096
+# The log panel keeps roughly this many trailing characters
+LOG_TAIL_CHARS = 200_000
+
 
 def _run_pipeline_background(
     repo,
     token,
     base,
-    log_queue,
-    event_queue,
+    out_queue,
     security_flag=False,
     pr_review_flag=False,
     ci_flag=False,
     confidence_flag=False,
     semantic_flag=False,
 ):
-    """Run the async pipeline in a thread and push logs/events to queues."""
+    """Run the async pipeline in a thread and push ("log", text) / ("event", (stage, info)) to one queue."""
+    # Imported here so page loads and reruns before a run don't pay for the agent/SDK import chain
+    from agents.orchestrator import run_pipeline
+
     def progress_cb(stage, info=None):
-        event_queue.put((stage, info))
+        out_queue.put(("event", (stage, info)))
 
     class QueueWriter:
+        """Queues whole lines (or LOG_BATCH_CHARS of output) instead of every write() call."""
+
         def __init__(self, q):
             self.q = q
+            self.buf = []
+            self.buf_len = 0
+            # print() runs on the pipeline thread, log records on the logging listener thread
+            self.lock = threading.Lock()
 
         def write(self, data):
-            if data:
-                self.q.put(data)
+            if not data:
+                return
+            with self.lock:
+                self.buf.append(data)
+                self.buf_len += len(data)
+                if "\n" not in data and self.buf_len < LOG_BATCH_CHARS:
+                    return
+                text = self._take()
+            self.q.put(("log", text))
 
         def flush(self):
-            pass
+            with self.lock:
+                text = self._take()
+            if text:
+                self.q.put(("log", text))
+
+        def _take(self):
+            text = "".join(self.buf)
+            self.buf.clear()
+            self.buf_len = 0
+            return text
 
-    qw = QueueWriter(log_queue)
+    qw = QueueWriter(out_queue)
     try:
-        # Redirect stdout to queue while running
-        with contextlib.redirect_stdout(qw):
+        # Capture this run's output without swapping sys.stdout, which other runs' threads share
+        with capture_stdout(qw):
             res = asyncio.run(
                 run_pipeline(
                     repo,
@@ -86,10 +148,12 @@ def _run_pipeline_background(
                     auto_create_pr=False,
                 )
             )
-            event_queue.put(("result", res))
+            out_queue.put(("event", ("result", res)))
     except Exception as e:
-        log_queue.put(f"ERROR: {e}\n")
-        event_queue.put(("error", str(e)))
+        qw.write(f"ERROR: {e}\n")
+        out_queue.put(("event", ("error", str(e))))
+    finally:
+        qw.flush()
 
 
 if run_now:
@@ -98,8 +162,7 @@ if run_now:
     elif not gh_token:
         st.error("Please provide a GitHub token (PAT).")
     else:
-        log_q: "queue.Queue[str]" = queue.Queue()
-        event_q: "queue.Queue[tuple]" = queue.Queue()
+        out_q: "queue.Queue[tuple]" = queue.Queue()
 
         # start thread later once we have the UI prepared
 
@@ -124,7 +187,9 @@ if run_now:
         }
 
         log_container = st.empty()
-        log_text = ""
+        # Chunks are joined only when the log panel is redrawn; += would recopy the whole log each time
+        log_parts: "deque[str]" = deque()
+        log_chars = 0
 
         stages["clone"].info("Clone: pending")
         stages["security"].info("Security: pending")
@@ -150,8 +215,7 @@ if run_now:
                 repo_url.strip(),
                 gh_token.strip(),
                 base_branch.strip() or None,
-                log_q,
-                event_q,
+                out_q,
                 enable_security,
                 enable_pr_review,
                 enable_ci,
@@ -163,70 +227,55 @@ if run_now:
         t.start()
 
         with st.spinner("Running agents — streaming logs below..."):
-            while t.is_alive() or not log_q.empty() or not event_q.empty():
+            while t.is_alive() or not out_q.empty():
+                # Block until the worker produces something instead of sleeping a fixed interval
+                try:
+                    batch = [out_q.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                # Then take what else is already queued, so one redraw covers the whole batch
+                while len(batch) < 64:
+                    try:
+                        batch.append(out_q.get_nowait())
+                    except queue.Empty:
+                        break
+
                 try:
-                    while not event_q.empty():
-                        stage, info = event_q.get_nowait()
-                        if stage == "clone:done":
-                            stages["clone"].success(f"Clone: done ({info})")
-                        elif stage == "scan:start":
-                            stages["scan"].info("Scan: running")
-                        elif stage == "security:start":
-                            stages["security"].info("Security lint: running")
-                        elif stage == "security:done":
-                            stages["security"].success("Security lint: done")
+                    appended = False
+                    for kind, payload in batch:
+                        if kind == "log":
+                            chunk = str(payload)
+                            log_parts.append(chunk)
+                            log_chars += len(chunk)
+                            appended = True
+                            continue
+                        stage, info = payload
+                        hit = STAGE_UPDATES.get(stage)
+                        if hit:
+                            box, kind, text = hit
+                            getattr(stages[box], kind)(text.format(info=info))
+
+                        # Events that carry data beyond a status line
+                        if stage == "security:done":
                             # show bandit artifact if present
                             if isinstance(info, str) and "Reference ID:" in info:
                                 # parse report id
-                                match = re.search(r"Reference ID: ([a-f0-9\-]{36})", info)
+                                match = _REF_ID_RE.search(info)
                                 if match:
                                     rid = match.group(1)
                                     art = get_artifact(rid)
                                     if art:
-                                        log_q.put(f"Bandit report ({rid}): {art.get('count')} issues\n")
-                                        log_q.put(str(art.get('issues')) + "\n")
-                        elif stage == "scan:done":
-                            stages["scan"].success("Scan: done")
-                        elif stage == "lint:start":
-                            stages["lint"].info("Lint: running")
+                                        bandit_text = f"Bandit report ({rid}): {art.get('count')} issues\n{art.get('issues')}\n"
+                                        log_parts.append(bandit_text)
+                                        log_chars += len(bandit_text)
+                                        appended = True
                         elif stage == "lint:done":
-                            stages["lint"].success("Lint: done")
                             if info:
-                                log_q.put(f"Lint/analysis output: {info}\n")
-                        elif stage == "analyze:start":
-                            stages["analyze"].info("Analyze: running")
-                        elif stage == "analyze:done":
-                            stages["analyze"].success("Analyze: done")
-                        elif stage == "semantic:start":
-                            stages["semantic"].info("Semantic refactor: running")
-                        elif stage == "semantic:done":
-                            stages["semantic"].success("Semantic refactor: done")
-                        elif stage == "confidence:start":
-                            stages["confidence"].info("Computing patch confidence...")
-                        elif stage == "confidence:done":
-                            stages["confidence"].success("Patch confidence: done")
-                        elif stage == "generate:start":
-                            stages["generate"].info("Generate: running")
-                        elif stage == "generate:done":
-                            stages["generate"].success("Generate: done")
-                        elif stage == "fix:start":
-                            stages["fix"].info("Fix: running")
-                        elif stage == "fix:done":
-                            stages["fix"].success("Fix: done")
-                        elif stage == "apply:done":
-                            stages["apply"].success("Apply: done")
-                        elif stage == "commit:start":
-                            stages["commit"].info("Commit: running")
-                        elif stage == "commit:done":
-                            stages["commit"].success(f"Commit: done ({info})")
-                        elif stage == "push:done":
-                            stages["push"].success(f"Push: done ({info})")
-                        elif stage == "publish:start":
-                            stages["publish"].info("Publish: running")
-                        elif stage == "publish:done":
-                            stages["publish"].success("Publish: done")
-                        elif stage == "pr:created" or stage == "pr:created":
-                            stages["pr"].success(f"PR created: {info}")
+                                lint_text = f"Lint/analysis output: {info}\n"
+                                log_parts.append(lint_text)
+                                log_chars += len(lint_text)
+                                appended = True
+                        elif stage == "pr:created":
                             # show PR link in separate area
                             st.markdown(f"**PR:** {info}")
                         elif stage == "cloner:notify":
@@ -242,37 +291,26 @@ if run_now:
                                         st.session_state['pr_pending'] = True
                             except Exception:
                                 pass
-                        elif stage == "prreview:start":
-                            stages["prreview"].info("PR review comments: running")
-                        elif stage == "prreview:done":
-                            stages["prreview"].success("PR review comments: done")
-                        elif stage == "ci:start":
-                            stages["ci"].info("CI integration: running")
-                        elif stage == "ci:done":
-                            stages["ci"].success("CI integration: done")
                         elif stage == "error":
                             st.error(f"Pipeline error: {info}")
 
-                    # append logs
-                    appended = False
-                    while not log_q.empty():
-                        chunk = log_q.get_nowait()
-                        log_text += str(chunk)
-                        appended = True
-
                     if appended:
-                        log_container.code(log_text)
+                        # Keep the panel (and what each redraw sends) to a bounded tail
+                        while log_chars > LOG_TAIL_CHARS and len(log_parts) > 1:
+                            log_chars -= len(log_parts.popleft())
+                        log_container.code("".join(log_parts))
 
                 except Exception:
                     pass
-                time.sleep(0.2)
 
         st.success("Pipeline finished")
-        log_container.code(log_text)
+        log_container.code("".join(log_parts))
 
         # If a PR is pending, show create-PR button
         if st.session_state.get('pr_pending'):
             if st.button("Create Pull Request"):
+                from agents.publish_agent import create_pull_request
+
                 res = st.session_state.get('pipeline_result') or {}
                 branch = res.get('branch')
                 if branch:
@@ -5,18 +5,28 @@ try:
     from google.genai.agents import Runner, InMemorySessionService
 except Exception:
     import importlib.util
+    import sys
+
     # Load local stub from project `google/genai` to allow running without external SDK
     base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    types_path = os.path.join(base, "google", "genai", "types.py")
-    agents_path = os.path.join(base, "google", "genai", "agents.py")
 
-    spec = importlib.util.spec_from_file_location("google.genai.types", types_path)
-    types = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(types)
+    def _load_stub(name: str, filename: str):
+        # Reuse a module already loaded under this name so the stub is only executed once
+        # per process and every importer sees the same classes
+        module = sys.modules.get(name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(name, os.path.join(base, "google", "genai", filename))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                sys.modules.pop(name, None)
+                raise
+        return module
 
-    spec2 = importlib.util.spec_from_file_location("google.genai.agents", agents_path)
-    agents_mod = importlib.util.module_from_spec(spec2)
-    spec2.loader.exec_module(agents_mod)
+    types = _load_stub("google.genai.types", "types.py")
+    agents_mod = _load_stub("google.genai.agents", "agents.py")
     Runner = agents_mod.Runner
     InMemorySessionService = agents_mod.InMemorySessionService
 
@@ -27,13 +37,12 @@ def ensure_dir(path: str) -> None:
 
 async def run_agent(runner: Runner, session_id: str, prompt: str) -> str:
     content = types.Content(role="user", parts=[types.Part(text=prompt)])
-    final_text = ""
+    # Collect the streamed chunks and join once; += would recopy the whole reply per chunk
+    parts_out: list[str] = []
     async for event in runner.stream_input_content(session_id=session_id, content=content):
         if event.type == "response.delta":
-            for part in event.delta.parts:
-                if part.text:
-                    final_text += part.text
-    return final_text
+            parts_out.extend(part.text for part in event.delta.parts if part.text)
+    return "".join(parts_out)
 
 def build_session_service() -> InMemorySessionService:
     return InMemorySessionService()
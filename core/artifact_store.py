@@ -0,0 +1,227 @@
+"""SQLite-backed artifact store.
+
+Unlike the in-process dicts in `core.artifacts`, reports kept here survive restarts
+and can be shared between worker processes. The database runs in WAL mode so
+readers never block the writer. Per-file lint results are cached by
+(mtime, size) and a key for the lint configuration (ruff version and config
+files), so unchanged files do not need to be linted again.
+
+Decoded reports are also kept in a small per-store LRU that this store's own
+writes and deletes invalidate. Report IDs are fresh UUIDs written once, so
+writes made by other processes do not need to reach it.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import TEMP_REPOS_DIR
+from .json_utils import dumps, loads
+
+DEFAULT_DB_PATH = os.path.join(TEMP_REPOS_DIR, "artifacts.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id TEXT PRIMARY KEY,
+    issues TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    repo_path TEXT,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memory (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_issues (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    config_key TEXT NOT NULL,
+    issues TEXT NOT NULL
+);
+"""
+
+# Bumped whenever a cache table changes shape; older cache tables are dropped, not migrated
+_SCHEMA_VERSION = 2
+
+# (st_mtime_ns, st_size) of a file when it was linted
+Fingerprint = Tuple[int, int]
+
+# Decoded reports kept in memory per ArtifactStore
+REPORT_CACHE_SIZE = 128
+
+# Paths per `IN (...)` lookup, well under SQLite's bound-parameter limit
+_PATH_BATCH = 500
+
+
+class _Database:
+    """One shared connection, opened lazily and guarded by a lock."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS file_issues")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+
+class ArtifactStore(MutableMapping):
+    """Mapping of report_id -> {"issues", "count", "repo_path"} persisted in SQLite."""
+
+    def __init__(self, db: _Database, cache_size: int = REPORT_CACHE_SIZE):
+        self._db = db
+        self._cache_size = cache_size
+        # report_id -> decoded report, most recently used last; guarded by the db lock
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _remember(self, report_id: str, report: Dict[str, Any]) -> None:
+        self._cache[report_id] = report
+        self._cache.move_to_end(report_id)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, report_id: str) -> Dict[str, Any]:
+        with self._db.lock:
+            report = self._cache.get(report_id)
+            if report is not None:
+                self._cache.move_to_end(report_id)
+                return report
+            row = self._db.conn.execute(
+                "SELECT issues, count, repo_path FROM reports WHERE report_id = ?", (report_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(report_id)
+            report = {"issues": loads(row[0]), "count": row[1], "repo_path": row[2]}
+            self._remember(report_id, report)
+            return report
+
+    def __setitem__(self, report_id: str, data: Dict[str, Any]) -> None:
+        issues = data.get("issues") or []
+        count = data.get("count", len(issues))
+        with self._db.lock, self._db.conn:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO reports (report_id, issues, count, repo_path, mtime) VALUES (?, ?, ?, ?, ?)",
+                (report_id, dumps(issues), count, data.get("repo_path"), time.time()),
+            )
+            # A fresh report is usually read right back, so cache it rather than just dropping the old entry
+            self._remember(report_id, {"issues": list(issues), "count": count, "repo_path": data.get("repo_path")})
+
+    def __delitem__(self, report_id: str) -> None:
+        with self._db.lock, self._db.conn:
+            self._cache.pop(report_id, None)
+            cur = self._db.conn.execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+        if cur.rowcount == 0:
+            raise KeyError(report_id)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._db.lock:
+            rows = self._db.conn.execute("SELECT report_id FROM reports ORDER BY mtime").fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def get_by_path_mtime(self, fingerprints: Dict[str, Fingerprint], config_key: str) -> Dict[str, List[dict]]:
+        """Return cached issues for every path whose (mtime_ns, size) and config_key still match."""
+        paths = list(fingerprints)
+        rows = []
+        with self._db.lock:
+            for i in range(0, len(paths), _PATH_BATCH):
+                batch = paths[i:i + _PATH_BATCH]
+                rows += self._db.conn.execute(
+                    "SELECT path, mtime_ns, size, issues FROM file_issues"
+                    f" WHERE config_key = ? AND path IN ({','.join('?' * len(batch))})",
+                    (config_key, *batch),
+                ).fetchall()
+        return {
+            path: loads(issues)
+            for path, mtime_ns, size, issues in rows
+            if fingerprints[path] == (mtime_ns, size)
+        }
+
+    def put_file_issues(self, entries: Dict[str, Tuple[Fingerprint, List[dict]]], config_key: str) -> None:
+        """Cache per-file issues keyed by the fingerprint the file had and the config it was linted under."""
+        rows = [(path, fp[0], fp[1], config_key, dumps(issues)) for path, (fp, issues) in entries.items()]
+        with self._db.lock, self._db.conn:
+            self._db.conn.executemany(
+                "INSERT OR REPLACE INTO file_issues (path, mtime_ns, size, config_key, issues) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+
+class MemoryBank(MutableMapping):
+    """Mapping of key -> JSON-serialisable value persisted in SQLite."""
+
+    def __init__(self, db: _Database):
+        self._db = db
+
+    def __getitem__(self, key: str) -> Any:
+        with self._db.lock:
+            row = self._db.conn.execute("SELECT value FROM memory WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return loads(row[0])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._db.lock, self._db.conn:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO memory (key, value) VALUES (?, ?)", (key, dumps(value))
+            )
+
+    def __delitem__(self, key: str) -> None:
+        with self._db.lock, self._db.conn:
+            cur = self._db.conn.execute("DELETE FROM memory WHERE key = ?", (key,))
+        if cur.rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._db.lock:
+            rows = self._db.conn.execute("SELECT key FROM memory").fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+
+def open_store(db_path: str = DEFAULT_DB_PATH) -> Tuple[ArtifactStore, MemoryBank]:
+    """Return an (ArtifactStore, MemoryBank) pair backed by the same database."""
+    db = _Database(db_path)
+    return ArtifactStore(db), MemoryBank(db)
+
+
+ARTIFACT_STORE, MEMORY_BANK = open_store()
+
+
+def store_issues(issues: List[dict], repo_path: str) -> str:
+    """Store issues in the artifact store and return the new report_id."""
+    report_id = str(uuid.uuid4())
+    issues = issues or []
+    ARTIFACT_STORE[report_id] = {"issues": issues, "count": len(issues), "repo_path": repo_path}
+    MEMORY_BANK["last_issues"] = issues
+    return report_id
+
+
+def get_artifact(report_id: str) -> dict | None:
+    return ARTIFACT_STORE.get(report_id)
+
+
+def get_by_path_mtime(fingerprints: Dict[str, Fingerprint], config_key: str) -> Dict[str, List[dict]]:
+    return ARTIFACT_STORE.get_by_path_mtime(fingerprints, config_key)
@@ -1,27 +1,62 @@
+import threading
 import uuid
-import json
+from collections import OrderedDict
 from typing import Dict, Any, List
 
-ARTIFACT_STORE: Dict[str, Dict[str, Any]] = {}
+from .json_utils import dumps
+
+# Most recently used reports last; the oldest are dropped past _MAX_ARTIFACTS so a
+# long-lived server doesn't keep every run's issues forever
+_MAX_ARTIFACTS = 128
+ARTIFACT_STORE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Only ever holds "last_issues", so it needs no bound
 MEMORY_BANK: Dict[str, Any] = {}
+# Reports are written by the pipeline and read by the UI thread
+_store_lock = threading.Lock()
 
 def store_issues(issues: List[dict], repo_path: str) -> str:
     """Store issues in artifact store. Always returns a valid report_id, even for empty lists."""
     report_id = str(uuid.uuid4())
-    ARTIFACT_STORE[report_id] = {
-        "issues": issues if issues else [],
-        "count": len(issues) if issues else 0,
+    issues = issues or []
+    report = {
+        "issues": issues,
+        "count": len(issues),
         "repo_path": repo_path,
+        # Compact JSON per issue, built once so prompts can just join them
+        "serialized": [dumps(issue, default=str) for issue in issues],
+        # Column of each issue's file, parallel to "issues", for passes that only need the path
+        "files": [issue.get("filename") or issue.get("file") for issue in issues],
+        # batch_size -> JSON array of the first batch_size issues, filled by fetch_issue_batch
+        "json_batches": {},
     }
-    MEMORY_BANK["last_issues"] = issues if issues else []
+    with _store_lock:
+        ARTIFACT_STORE[report_id] = report
+        while len(ARTIFACT_STORE) > _MAX_ARTIFACTS:
+            ARTIFACT_STORE.popitem(last=False)
+    MEMORY_BANK["last_issues"] = issues
     return report_id
 
 def fetch_issue_batch(report_id: str, batch_size: int = 3) -> str:
-    data = ARTIFACT_STORE.get(report_id)
+    data = get_artifact(report_id)
     if not data:
         return "Error: Report ID not found."
-    batch = data.get("issues", [])[:batch_size]
-    return json.dumps(batch) if batch else "No more issues to fix."
+    batches = data.setdefault("json_batches", {})
+    cached = batches.get(batch_size)
+    if cached is None:
+        serialized = data.get("serialized")
+        if serialized is not None:
+            # Joining the per-issue JSON gives the same text as dumping the slice
+            batch = serialized[:batch_size]
+            cached = "[" + ",".join(batch) + "]" if batch else ""
+        else:
+            batch = data.get("issues", [])[:batch_size]
+            cached = dumps(batch) if batch else ""
+        batches[batch_size] = cached
+    return cached or "No more issues to fix."
 
 def get_artifact(report_id: str) -> dict | None:
-    return ARTIFACT_STORE.get(report_id)
+    with _store_lock:
+        data = ARTIFACT_STORE.get(report_id)
+        if data is not None:
+            ARTIFACT_STORE.move_to_end(report_id)
+        return data
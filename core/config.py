@@ -16,6 +16,13 @@ else:
     # Fallback to local directory
     TEMP_REPOS_DIR = "./temp_repos"
 
+# Ruff's per-file cache lives outside the (throwaway) cloned repos so that
+# repeated runs over the same tree only re-parse files that changed
+RUFF_CACHE_DIR = os.getenv("RUFF_CACHE_DIR", os.path.abspath("./.ruff_cache_shared"))
+
+# Level of the "autopatch" loggers (see core.logging_utils), e.g. DEBUG or WARNING
+LOG_LEVEL = os.getenv("AUTOPATCH_LOG_LEVEL", "INFO").upper()
+
 def get_google_api_key() -> str:
     key = os.getenv("GOOGLE_API_KEY")
     if not key:
@@ -0,0 +1,73 @@
+# GitHub GraphQL
+# Batched PR lookups: one request for many PRs instead of one REST call each
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from .json_utils import dumpb, loads
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+# GraphQL connections return at most 100 nodes per page
+MAX_FILES_PER_PR = 100
+
+# (owner, repo, pr_number)
+PRRef = Tuple[str, str, int]
+
+
+def _files_query(count: int) -> str:
+    """One aliased `repository { pullRequest { files } }` block per PR, bound to variables."""
+    params = ", ".join(f"$o{i}: String!, $r{i}: String!, $n{i}: Int!" for i in range(count))
+    blocks = "\n".join(
+        f"  pr{i}: repository(owner: $o{i}, name: $r{i}) {{ pullRequest(number: $n{i}) {{ "
+        f"files(first: $first) {{ nodes {{ path additions deletions changeType }} }} }} }}"
+        for i in range(count)
+    )
+    return f"query({params}, $first: Int!) {{\n{blocks}\n}}"
+
+
+def _rest_shape(node: dict) -> dict:
+    """Map a PullRequestChangedFile node onto the fields of the REST "list PR files" entries."""
+    additions, deletions = node.get("additions", 0), node.get("deletions", 0)
+    return {
+        "filename": node.get("path", "unknown"),
+        "status": (node.get("changeType") or "MODIFIED").lower(),
+        "additions": additions,
+        "deletions": deletions,
+        "changes": additions + deletions,
+    }
+
+
+def fetch_pr_files_batch(
+    pr_refs: Iterable[PRRef],
+    gh_token: str,
+    session: Optional[requests.Session] = None,
+    max_files: int = MAX_FILES_PER_PR,
+) -> Dict[PRRef, Optional[List[dict]]]:
+    """Fetch the changed files of several PRs with a single GraphQL request.
+
+    Returns {(owner, repo, number): files} with files shaped like the REST API's entries
+    (without `patch`, which GraphQL does not expose), or None for PRs that could not be
+    resolved. Raises requests.HTTPError if the request itself fails.
+    """
+    refs = list(dict.fromkeys(pr_refs))
+    if not refs:
+        return {}
+    variables = {"first": min(max_files, MAX_FILES_PER_PR)}
+    for i, (owner, repo, number) in enumerate(refs):
+        variables.update({f"o{i}": owner, f"r{i}": repo, f"n{i}": int(number)})
+
+    resp = (session or requests).post(
+        GRAPHQL_URL,
+        headers={"Authorization": f"bearer {gh_token}", "Content-Type": "application/json"},
+        data=dumpb({"query": _files_query(len(refs)), "variables": variables}),
+        timeout=15,
+    )
+    resp.raise_for_status()
+    # Partial failures (unknown repo or PR) come back as null entries next to "errors"
+    data = loads(resp.content).get("data") or {}
+
+    result: Dict[PRRef, Optional[List[dict]]] = {}
+    for i, ref in enumerate(refs):
+        pr = (data.get(f"pr{i}") or {}).get("pullRequest")
+        result[ref] = [_rest_shape(n) for n in pr["files"]["nodes"]] if pr else None
+    return result
@@ -0,0 +1,34 @@
+# HTTP client
+# The one pooled requests.Session every module uses to talk to the GitHub API
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class _GitHubRetry(Retry):
+    """Retry 5xx on idempotent methods only (a replayed POST could open a second PR), but
+    rate-limit responses on any method: a 429, or GitHub's secondary-limit 403 carrying
+    Retry-After, means the request was not acted on. Retry-After is honoured as the wait."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429 or (status_code == 403 and has_retry_after):
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+GITHUB_SESSION = requests.Session()
+GITHUB_SESSION.headers.update({"Accept": "application/vnd.github+json"})
+# Sized for several pipelines in one process, each with a PR create, a duplicate-check
+# prefetch and a review comment in flight at once. Once retries run out the last response
+# is returned as-is, so callers still see (and report) the status code.
+GITHUB_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=_GitHubRetry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+))
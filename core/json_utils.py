@@ -0,0 +1,29 @@
+"""JSON helpers that use orjson when it is installed and fall back to the stdlib."""
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def loads(data: str | bytes) -> Any:
+    """Parse JSON from a str or bytes payload."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Serialize `obj` to a compact JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default).decode("utf-8")
+    return json.dumps(obj, default=default, separators=(",", ":"))
+
+
+def dumpb(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Serialize `obj` to compact UTF-8 JSON bytes, e.g. for an HTTP request body."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default)
+    return json.dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,125 @@
+"""Buffered logging for the pipeline.
+
+Loggers under "autopatch" hand their records to a queue; a single background
+QueueListener formats them and writes them out, so pipeline tasks never wait on
+stdout.
+
+Several pipelines can share one event loop, so their output is not captured by
+swapping `sys.stdout` per run. `capture_stdout(writer)` instead sets a context
+variable: `print()` goes through a `sys.stdout` proxy installed once, and each log
+record carries the writer that was current where it was logged. Threads started
+with `asyncio.to_thread` copy the context, so they follow their run. Call
+`flush_logs()` before a capture ends.
+"""
+import atexit
+import contextlib
+import contextvars
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Optional, TextIO
+
+from .config import LOG_LEVEL
+
+ROOT_LOGGER = "autopatch"
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_listener: logging.handlers.QueueListener | None = None
+_setup_lock = threading.Lock()
+
+# The writer the current run's output goes to; None outside capture_stdout
+_run_stdout: "contextvars.ContextVar[Optional[TextIO]]" = contextvars.ContextVar("autopatch_run_stdout", default=None)
+
+
+class _RunStdout:
+    """sys.stdout stand-in that writes to the current context's run writer, else to the real stdout."""
+
+    def __init__(self, default: TextIO):
+        self._default = default
+
+    def _target(self) -> TextIO:
+        return _run_stdout.get() or self._default
+
+    def write(self, data: str) -> int:
+        return self._target().write(data)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+@contextlib.contextmanager
+def capture_stdout(writer: TextIO):
+    """Send print() and "autopatch" log output from this context to writer.
+
+    Unlike `contextlib.redirect_stdout` this leaves `sys.stdout` alone after the first
+    call, so captures in concurrent tasks on one loop neither mix nor undo each other.
+    """
+    with _setup_lock:
+        if not isinstance(sys.stdout, _RunStdout):
+            sys.stdout = _RunStdout(sys.stdout)
+    token = _run_stdout.set(writer)
+    try:
+        yield writer
+    finally:
+        _run_stdout.reset(token)
+
+
+class _RunQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that tags each record with the run writer current where it was logged."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.run_stdout = _run_stdout.get()
+        return record
+
+
+class _CurrentStdoutHandler(logging.StreamHandler):
+    """StreamHandler bound to the record's run writer, else the current sys.stdout."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        flushed = getattr(record, "flush_event", None)
+        if flushed is not None:
+            flushed.set()
+            return True
+        return super().handle(record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = getattr(record, "run_stdout", None) or sys.stdout
+        super().emit(record)
+
+
+def _ensure_listener() -> None:
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        handler = _CurrentStdoutHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(_RunQueueHandler(_queue))
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(_queue, handler, respect_handler_level=True)
+        _listener.start()
+        # The listener thread is a daemon; write out whatever is still queued at exit
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return the "autopatch.<name>" logger, starting the background listener on first use."""
+    _ensure_listener()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def flush_logs(timeout: float = 5.0) -> bool:
+    """Block until every record queued so far has been written. Returns False on timeout."""
+    if _listener is None:
+        return True
+    done = threading.Event()
+    _queue.put_nowait(logging.makeLogRecord({"levelno": logging.CRITICAL, "flush_event": done}))
+    return done.wait(timeout)
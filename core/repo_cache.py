@@ -0,0 +1,128 @@
+# Repo cache
+# Bare mirrors of remote repos, reused across pipeline runs
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from git import GitCommandError, Repo
+
+from .config import TEMP_REPOS_DIR
+from .git_utils import CloneResult, authenticated_url, forget_repo
+from .logging_utils import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+MIRRORS_DIR = os.path.join(TEMP_REPOS_DIR, ".mirrors")
+# Mirrors older than this are re-cloned from scratch instead of updated
+MIRROR_MAX_AGE = 7 * 24 * 3600
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+log = get_logger("repo_cache")
+
+
+def _mirror_path(repo_url: str) -> str:
+    clean = repo_url.rstrip("/").removesuffix(".git")
+    return os.path.join(MIRRORS_DIR, hashlib.sha1(clean.encode("utf-8")).hexdigest() + ".git")
+
+
+@contextlib.contextmanager
+def _locked(mirror_path: str):
+    """Serialise work on one mirror across threads and, where supported, processes."""
+    with _locks_guard:
+        lock = _locks.setdefault(mirror_path, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(mirror_path + ".lock", "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def get_or_update_mirror(repo_url: str, github_token: Optional[str] = None) -> str:
+    """Return the path of a bare mirror of repo_url, cloning it on a miss and fetching on a hit."""
+    os.makedirs(MIRRORS_DIR, exist_ok=True)
+    mirror = _mirror_path(repo_url)
+    fetch_url = authenticated_url(repo_url, github_token)
+    with _locked(mirror):
+        stamp = os.path.join(mirror, "patcher-cloned-at")
+        if os.path.exists(mirror):
+            try:
+                stale = time.time() - os.path.getmtime(stamp) > MIRROR_MAX_AGE
+            except OSError:
+                stale = True
+            if stale:
+                shutil.rmtree(mirror, ignore_errors=True)
+
+        if os.path.exists(mirror):
+            # Fetch by URL so the token is never written to the mirror's config
+            Repo(mirror).git.fetch("--prune", fetch_url, "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+        else:
+            Repo.clone_from(fetch_url, mirror, multi_options=["--mirror"])
+            Repo(mirror).remotes.origin.set_url(repo_url)
+            with open(stamp, "w"):
+                pass
+    return mirror
+
+
+def checkout(repo_url: str, branch: Optional[str] = None, github_token: Optional[str] = None,
+             dest_dir: str = TEMP_REPOS_DIR) -> CloneResult:
+    """Produce a fresh working copy of repo_url under dest_dir, backed by the local mirror.
+
+    Each call checks out into its own new directory, so concurrent runs on the same repo
+    never share (or delete) each other's working copy; pass the result to `discard` when
+    done. The working copy is cloned from the mirror, so only the delta since the last
+    run crosses the network, and then dissociated (`--reference --dissociate`): it owns
+    its objects, so re-cloning or fetching the mirror while it is in use cannot break
+    it. Its `origin` points at repo_url, as
+    with `clone_repo`. If `branch` does not exist the default branch is checked out and
+    a warning is logged. Raises RuntimeError if the repository cannot be fetched or
+    checked out.
+    """
+    repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
+    os.makedirs(dest_dir, exist_ok=True)
+    local_path = tempfile.mkdtemp(prefix=f"{repo_name}-", dir=dest_dir)
+    # The name may belong to an earlier, discarded checkout; never reuse its Repo handle
+    forget_repo(local_path)
+    try:
+        mirror = get_or_update_mirror(repo_url, github_token)
+        with _locked(mirror):
+            mirror_repo = Repo(mirror)
+            # Copy the objects rather than borrow them (--shared): a stale mirror is deleted and
+            # fetch --prune may gc it while another run's working copy is still live
+            opts = ["--reference", mirror, "--dissociate"]
+            if branch and branch in mirror_repo.heads:
+                opts += ["--branch", branch]
+            elif branch:
+                log.warning("[Clone] Branch %r not found in %s; checking out the default branch", branch, repo_url)
+            repo = Repo.clone_from(mirror, local_path, multi_options=opts)
+        origin_url = repo_url.rstrip("/")
+        repo.remotes.origin.set_url(origin_url)
+        head_sha = repo.head.commit.hexsha
+        repo.close()
+    except GitCommandError as e:
+        shutil.rmtree(local_path, ignore_errors=True)
+        raise RuntimeError(f"[Clone] Failed to fetch {repo_url}: {e}") from e
+    except BaseException:
+        shutil.rmtree(local_path, ignore_errors=True)
+        raise
+    return CloneResult(local_path, origin_url, head_sha)
+
+
+def discard(clone: CloneResult) -> None:
+    """Delete a working copy produced by `checkout`. The mirror behind it is kept."""
+    forget_repo(clone.path)
+    shutil.rmtree(clone.path, ignore_errors=True)
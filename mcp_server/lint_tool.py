@@ -2,17 +2,20 @@
 import json
 import subprocess
 from typing import List, Dict, Any
+from core.config import RUFF_CACHE_DIR
 
 def run_ruff(root: str) -> List[Dict[str, Any]]:
     """
     Run ruff on the repo and return issues as a list of dicts.
     """
     try:
+        # ruff exits non-zero whenever it reports issues, so parse stdout regardless
         result = subprocess.run(
-            ["ruff", "check", root, "--format", "json"],
+            ["ruff", "check", root, "--output-format=json", "--no-fix", "--force-exclude",
+             "--cache-dir", RUFF_CACHE_DIR],
             capture_output=True,
             text=True,
-            check=True,
+            check=False,
         )
         if not result.stdout.strip():
             return []
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for the SQLite artifact store's per-file lint cache.
+"""
+import os
+import sys
+import tempfile
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.artifact_store import open_store
+from agents import notebook_agents as nb
+
+ISSUE = {"code": "F401", "filename": "/repo/a.py"}
+
+
+def test_file_issue_cache_hit_and_miss():
+    with tempfile.TemporaryDirectory() as tmp:
+        store, _ = open_store(os.path.join(tmp, "artifacts.db"))
+        store.put_file_issues({"/repo/a.py": ((100, 10), [ISSUE]), "/repo/b.py": ((200, 20), [])}, "cfg1")
+
+        # Same fingerprint and config: both files hit, including the one with no issues
+        hits = store.get_by_path_mtime({"/repo/a.py": (100, 10), "/repo/b.py": (200, 20)}, "cfg1")
+        assert hits == {"/repo/a.py": [ISSUE], "/repo/b.py": []}
+
+        # Changed mtime, changed size, unknown path and a different config all miss
+        assert store.get_by_path_mtime({"/repo/a.py": (101, 10)}, "cfg1") == {}
+        assert store.get_by_path_mtime({"/repo/a.py": (100, 11)}, "cfg1") == {}
+        assert store.get_by_path_mtime({"/repo/c.py": (100, 10)}, "cfg1") == {}
+        assert store.get_by_path_mtime({"/repo/a.py": (100, 10)}, "cfg2") == {}
+        assert store.get_by_path_mtime({}, "cfg1") == {}
+
+        # Re-linting a file replaces its entry
+        store.put_file_issues({"/repo/a.py": ((300, 10), [])}, "cfg2")
+        assert store.get_by_path_mtime({"/repo/a.py": (300, 10)}, "cfg2") == {"/repo/a.py": []}
+        assert store.get_by_path_mtime({"/repo/a.py": (100, 10)}, "cfg1") == {}
+
+
+def test_file_issue_cache_many_paths():
+    with tempfile.TemporaryDirectory() as tmp:
+        store, _ = open_store(os.path.join(tmp, "artifacts.db"))
+        entries = {f"/repo/m{i}.py": ((i, i), [{"code": "E501", "n": i}]) for i in range(1200)}
+        store.put_file_issues(entries, "cfg")
+        hits = store.get_by_path_mtime({p: fp for p, (fp, _) in entries.items()}, "cfg")
+        assert len(hits) == 1200
+        assert hits["/repo/m1199.py"] == [{"code": "E501", "n": 1199}]
+
+
+def _report_codes(message):
+    report_id = message.split("Reference ID: ", 1)[1]
+    return sorted((os.path.basename(i["filename"]), i["code"]) for i in nb.ARTIFACT_STORE[report_id]["issues"])
+
+
+def test_run_linter_and_store_warm_run_matches_cold_run():
+    saved = nb.ARTIFACT_STORE
+    with tempfile.TemporaryDirectory() as tmp:
+        nb.ARTIFACT_STORE, _ = open_store(os.path.join(tmp, "artifacts.db"))
+        try:
+            repo = os.path.join(tmp, "repo")
+            os.makedirs(repo)
+            with open(os.path.join(repo, "a.py"), "w") as fh:
+                fh.write("import os\n")
+            with open(os.path.join(repo, "b.pyi"), "w") as fh:
+                fh.write("import sys\n")
+            with open(os.path.join(repo, "ruff.toml"), "w") as fh:
+                fh.write('[lint]\nselect = ["F"]\n')
+
+            cold = _report_codes(nb.run_linter_and_store(repo))
+            assert cold == [("a.py", "F401"), ("b.pyi", "F401")], cold
+            assert _report_codes(nb.run_linter_and_store(repo)) == cold
+
+            # A config change must not be answered from the cache
+            with open(os.path.join(repo, "ruff.toml"), "w") as fh:
+                fh.write('[lint]\nselect = ["E"]\n')
+            assert nb.run_linter_and_store(repo) == "No issues found."
+        finally:
+            nb.ARTIFACT_STORE = saved
+
+
+if __name__ == "__main__":
+    test_file_issue_cache_hit_and_miss()
+    test_file_issue_cache_many_paths()
+    test_run_linter_and_store_warm_run_matches_cold_run()
+    print("artifact store checks passed")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for compute_confidence's partial re-lint of changed files.
+"""
+import os
+import sys
+import tempfile
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents.analysis_agent import _ruff_excluded, compute_confidence, run_ruff_on_content, run_ruff_on_path
+from core.artifacts import store_issues
+
+RUFF_TOML = 'line-length = 40\n[lint]\nselect = ["E501", "F"]\n'
+LONG_LINE = 'x = "' + "a" * 60 + '"\n'
+
+
+def _make_repo(root):
+    with open(os.path.join(root, "ruff.toml"), "w") as fh:
+        fh.write(RUFF_TOML)
+    with open(os.path.join(root, "a.py"), "w") as fh:
+        fh.write("import os\n" + LONG_LINE)
+    with open(os.path.join(root, "b.py"), "w") as fh:
+        fh.write("import sys\n")
+
+
+def test_changed_files_mapping_uses_repo_config():
+    with tempfile.TemporaryDirectory() as root:
+        _make_repo(root)
+        issues = run_ruff_on_path(root)
+        assert sorted(i["code"] for i in issues) == ["E501", "F401", "F401"]
+        report_id = store_issues(issues, root)
+
+        # a.py keeps its long line (E501 under the repo's line-length) but drops the unused import;
+        # b.py is untouched, so its stored issue is carried over without re-linting
+        result = compute_confidence(report_id, root, {"a.py": LONG_LINE})
+        assert result["summary"].startswith("Before: 3 issues, After: 2 issues"), result
+        assert abs(result["score"] - 1 / 3) < 1e-9
+
+
+def test_changed_files_list_reads_from_disk():
+    with tempfile.TemporaryDirectory() as root:
+        _make_repo(root)
+        report_id = store_issues(run_ruff_on_path(root), root)
+        with open(os.path.join(root, "a.py"), "w") as fh:
+            fh.write("x = 1\n")
+        with open(os.path.join(root, "b.py"), "w") as fh:
+            fh.write("y = 2\n")
+
+        result = compute_confidence(report_id, root, ["a.py", "b.py"])
+        assert result["score"] == 1.0, result
+        assert "After: 0 issues" in result["summary"]
+
+
+def _codes(issues):
+    return sorted((i["code"], i["location"]["row"]) for i in issues)
+
+
+def test_server_and_stdin_agree_on_excludes():
+    with tempfile.TemporaryDirectory() as root:
+        _make_repo(root)
+        with open(os.path.join(root, "ruff.toml"), "w") as fh:
+            fh.write('extend-exclude = ["generated", "*_pb2.py"]\n' + RUFF_TOML)
+        os.makedirs(os.path.join(root, "generated", "deep"))
+        cases = {
+            "generated/deep/x.py": True,
+            "api_pb2.py": True,
+            ".venv/site.py": True,
+            "a.py": False,
+        }
+        for rel, excluded in cases.items():
+            path = os.path.join(root, rel)
+            assert _ruff_excluded(path, root) is excluded, rel
+            via_server = _codes(run_ruff_on_content("import os\n", path, root))
+            via_stdin = _codes(run_ruff_on_content("import os\n", path))
+            assert via_server == via_stdin, (rel, via_server, via_stdin)
+            assert bool(via_stdin) is not excluded, (rel, via_stdin)
+
+
+if __name__ == "__main__":
+    test_changed_files_mapping_uses_repo_config()
+    test_changed_files_list_reads_from_disk()
+    test_server_and_stdin_agree_on_excludes()
+    print("compute_confidence checks passed")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for per-run output capture when pipelines share one event loop.
+"""
+import asyncio
+import os
+import queue
+import sys
+import tempfile
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from git import Actor, Repo
+
+from agents.orchestrator import run_pipeline
+from core import repo_cache
+from core.logging_utils import capture_stdout, flush_logs, get_logger
+
+AUTHOR = Actor("Test", "test@example.com")
+
+
+class QueueWriter:
+    """Collects whatever one run writes, as the UI's writer does."""
+
+    def __init__(self):
+        self.q = queue.Queue()
+
+    def write(self, data):
+        if data:
+            self.q.put(data)
+
+    def flush(self):
+        pass
+
+    def text(self):
+        return "".join(self.q.queue)
+
+
+def _make_remote(tmp, name):
+    seed = Repo.init(os.path.join(tmp, f"{name}-seed"), initial_branch="master")
+    with open(os.path.join(seed.working_dir, "a.py"), "w") as fh:
+        fh.write("import os\n")
+    seed.index.add(["a.py"])
+    seed.index.commit("init", author=AUTHOR, committer=AUTHOR)
+    remote = os.path.join(tmp, f"{name}.git")
+    seed.clone(remote, bare=True)
+    return "file://" + remote
+
+
+def test_interleaved_captures_stay_separate():
+    log = get_logger("test")
+    real_stdout = sys.stdout
+
+    async def run(name, writer, started, other_started):
+        with capture_stdout(writer):
+            started.set()
+            await other_started.wait()
+            for i in range(20):
+                print(f"{name} print {i}")
+                log.info("%s log %d", name, i)
+                await asyncio.to_thread(print, f"{name} thread {i}")
+                await asyncio.sleep(0)
+
+    async def main():
+        a, b = QueueWriter(), QueueWriter()
+        a_started, b_started = asyncio.Event(), asyncio.Event()
+        await asyncio.gather(run("A", a, a_started, b_started), run("B", b, b_started, a_started))
+        await asyncio.to_thread(flush_logs)
+        return a.text(), b.text()
+
+    a_text, b_text = asyncio.run(main())
+    for name, text, other in (("A", a_text, "B"), ("B", b_text, "A")):
+        for kind in ("print", "log", "thread"):
+            assert text.count(f"{name} {kind} ") == 20, (name, kind, text)
+        assert f"{other} " not in text, text
+    # Nothing swapped sys.stdout for good: outside a capture, output still reaches the real stdout
+    assert getattr(sys.stdout, "_default", sys.stdout) is real_stdout
+
+
+def test_concurrent_pipelines_keep_their_own_output():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = repo_cache.MIRRORS_DIR
+        repo_cache.MIRRORS_DIR = os.path.join(tmp, "mirrors")
+        try:
+            url_a, url_b = _make_remote(tmp, "alpha"), _make_remote(tmp, "beta")
+
+            async def run(url, writer, events):
+                with capture_stdout(writer):
+                    return await run_pipeline(url, "", "master", lambda stage, info: events.append(stage))
+
+            async def main():
+                a, b = QueueWriter(), QueueWriter()
+                events_a, events_b = [], []
+                results = await asyncio.gather(run(url_a, a, events_a), run(url_b, b, events_b))
+                return results, a.text(), b.text(), events_a, events_b
+
+            results, a_text, b_text, events_a, events_b = asyncio.run(main())
+            assert [r["status"] for r in results] == ["ok", "ok"], results
+            assert "push:done" in events_a and "push:done" in events_b
+            # Each run's prints (git_utils, in worker threads) and logs (orchestrator) stay in its writer
+            for text, own, other in ((a_text, url_a, url_b), (b_text, url_b, url_a)):
+                assert f"configured URL: {own}" in text, text
+                assert f"will push to {own.removesuffix('.git')}" in text, text
+                assert other not in text, text
+        finally:
+            repo_cache.MIRRORS_DIR = saved
+
+
+if __name__ == "__main__":
+    test_interleaved_captures_stay_separate()
+    test_concurrent_pipelines_keep_their_own_output()
+    print("output capture checks passed", file=sys.__stdout__)
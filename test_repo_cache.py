@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Behaviour checks for mirror-backed checkouts and the cached Repo handles used to push them.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Add project to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from git import Actor, Repo
+
+from core import git_utils, repo_cache
+from core.git_utils import create_branch_and_push
+
+AUTHOR = Actor("Test", "test@example.com")
+
+
+def _make_remote(tmp):
+    """A bare 'remote' with one commit on master, and its file:// URL."""
+    seed = Repo.init(os.path.join(tmp, "seed"), initial_branch="master")
+    with open(os.path.join(seed.working_dir, "a.py"), "w") as fh:
+        fh.write("x = 1\n")
+    seed.index.add(["a.py"])
+    seed.index.commit("init", author=AUTHOR, committer=AUTHOR)
+    remote = os.path.join(tmp, "remote.git")
+    seed.clone(remote, bare=True)
+    return Repo(remote), "file://" + remote
+
+
+def _edit_and_push(path, branch):
+    with open(os.path.join(path, "a.py"), "a") as fh:
+        fh.write(f"# {branch}\n")
+    return create_branch_and_push(path, branch, files_to_add=["a.py"], commit_message=branch)
+
+
+def _with_mirrors(tmp):
+    saved = repo_cache.MIRRORS_DIR
+    repo_cache.MIRRORS_DIR = os.path.join(tmp, "mirrors")
+    return saved
+
+
+def test_checkout_twice_then_push():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = _with_mirrors(tmp)
+        try:
+            remote, url = _make_remote(tmp)
+            work = os.path.join(tmp, "work")
+
+            first = repo_cache.checkout(url, "master", dest_dir=work)
+            second = repo_cache.checkout(url, "master", dest_dir=work)
+            # Concurrent runs get separate working copies; the second must not delete the first
+            assert first.path != second.path
+            assert os.path.isfile(os.path.join(first.path, "a.py"))
+            assert first.head_sha == second.head_sha == remote.head.commit.hexsha
+
+            assert _edit_and_push(first.path, "run-1") == "run-1"
+            assert _edit_and_push(second.path, "run-2") == "run-2"
+            assert {"run-1", "run-2"} <= {h.name for h in remote.heads}
+
+            repo_cache.discard(first)
+            repo_cache.discard(second)
+            assert not os.path.exists(first.path) and not os.path.exists(second.path)
+        finally:
+            repo_cache.MIRRORS_DIR = saved
+
+
+def test_reused_checkout_path_gets_a_fresh_repo_handle():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = _with_mirrors(tmp)
+        saved_mkdtemp = repo_cache.tempfile.mkdtemp
+        try:
+            remote, url = _make_remote(tmp)
+            work = os.path.join(tmp, "work")
+
+            first = repo_cache.checkout(url, "master", dest_dir=work)
+            assert _edit_and_push(first.path, "run-1") == "run-1"
+            repo_cache.discard(first)
+
+            # A later checkout that lands on the same directory name (mkdtemp may reuse one)
+            def same_dir(prefix="", dir=None):
+                os.makedirs(first.path)
+                return first.path
+
+            repo_cache.tempfile.mkdtemp = same_dir
+            second = repo_cache.checkout(url, "master", dest_dir=work)
+            repo_cache.tempfile.mkdtemp = saved_mkdtemp
+            assert second.path == first.path
+
+            assert _edit_and_push(second.path, "run-2") == "run-2"
+            assert "run-2" in {h.name for h in remote.heads}
+        finally:
+            repo_cache.tempfile.mkdtemp = saved_mkdtemp
+            repo_cache.MIRRORS_DIR = saved
+
+
+def test_checkout_survives_mirror_reclone():
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = _with_mirrors(tmp)
+        saved_max_age = repo_cache.MIRROR_MAX_AGE
+        try:
+            remote, url = _make_remote(tmp)
+            work = os.path.join(tmp, "work")
+
+            live = repo_cache.checkout(url, "master", dest_dir=work)
+            assert not os.path.exists(os.path.join(live.path, ".git", "objects", "info", "alternates"))
+
+            # Another run finds the mirror stale and re-clones it while the first checkout is in use
+            repo_cache.MIRROR_MAX_AGE = -1
+            other = repo_cache.checkout(url, "master", dest_dir=work)
+            repo_cache.MIRROR_MAX_AGE = saved_max_age
+            shutil.rmtree(repo_cache._mirror_path(url))
+
+            assert _edit_and_push(live.path, "run-1") == "run-1"
+            assert "run-1" in {h.name for h in remote.heads}
+            repo_cache.discard(live)
+            repo_cache.discard(other)
+        finally:
+            repo_cache.MIRROR_MAX_AGE = saved_max_age
+            repo_cache.MIRRORS_DIR = saved
+
+
+def test_forget_repo_after_reclone():
+    with tempfile.TemporaryDirectory() as tmp:
+        remote, url = _make_remote(tmp)
+        path = os.path.join(tmp, "clone")
+        Repo.clone_from(url, path).close()
+        assert git_utils._repo(path).head.commit.hexsha == remote.head.commit.hexsha
+
+        git_utils.forget_repo(path)
+        shutil.rmtree(path)
+        Repo.clone_from(url, path).close()
+        assert git_utils._repo(path).head.commit.hexsha == remote.head.commit.hexsha
+        git_utils.forget_repo(path)
+
+
+if __name__ == "__main__":
+    test_checkout_twice_then_push()
+    test_reused_checkout_path_gets_a_fresh_repo_handle()
+    test_checkout_survives_mirror_reclone()
+    test_forget_repo_after_reclone()
+    print("repo cache checks passed")